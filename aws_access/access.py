@@ -59,25 +59,50 @@ class AWSAccess(BaseEmailAccess):
                                        Defaults to False.
             auto_approve_rules (str, optional): Rules for auto approval. Defaults to None.
 
+        When plan_grants is enabled, groups the user is already a member of
+        are not granted again. When async_notifications is enabled the
+        approval email is sent in the background and the approval succeeds
+        once the access is granted.
+
         Returns:
             bool: True if the access approval is success, False in case of failure.
         """
         user = user_identity.user
-        label_desc = self.combine_labels_desc(labels)
-        label_meta = self.combine_labels_meta(labels)
-        for label in labels:
-            granted_access, exception = helpers.grant_aws_access(
-                user, label["account"], label["group"]
-            )
-
-            if not granted_access:
+        label_desc, label_meta = self.summarize_labels(labels)
+        grant_labels = labels
+        if helpers.plan_grants_enabled():
+            plan = self.plan_grant(user_identity, labels)
+            for label, reason in plan["invalid"]:
                 logger.error(
-                    "Something when wrong while adding %s to group %s: %s",
-                    user.email,
-                    label["group"],
-                    str(exception)
+                    "Can not add %s to group %s: %s", user.email, label["group"], reason
                 )
+            if plan["invalid"]:
                 return False
+            grant_labels = plan["grant"]
+
+        granted_access, results = helpers.grant_aws_access_batch(user, grant_labels)
+        if not granted_access:
+            for label, granted, exception in results:
+                if not granted:
+                    logger.error(
+                        "Something when wrong while adding %s to group %s: %s",
+                        user.email,
+                        label["group"],
+                        str(exception)
+                    )
+            return False
+
+        if helpers.async_notifications_enabled():
+            helpers.dispatch_notification(
+                self.__send_approve_email,
+                auto_approve_rules,
+                request.request_id,
+                label_desc,
+                user,
+                approver,
+                label_meta,
+            )
+            return True
 
         try:
             self.__send_approve_email(
@@ -94,6 +119,19 @@ class AWSAccess(BaseEmailAccess):
 
         return True
 
+    def plan_grant(self, user_identity, labels):
+        """Works out the group grants an approval needs without granting them.
+
+        Args:
+            user_identity (UserIdentity): Identity of the user to be granted access.
+            labels (array): Access labels to be granted.
+
+        Returns:
+            dict: Labels to grant, labels already granted and (label, reason)
+                  pairs of labels that can not be granted.
+        """
+        return helpers.plan_aws_grants(user_identity.user, labels)
+
     def __send_approve_email(
         self, auto_approve_rules, request_id, label_desc, user, approver, label_meta
     ):
@@ -171,18 +209,31 @@ class AWSAccess(BaseEmailAccess):
         Returns:
             dict: Dictionary of access label keys and values.
         """
-        if access_labels:
-            combined_meta = {"action": "", "account": "", "group": ""}
-            for label in access_labels:
-                for key, value in label.items():
-                    if str(combined_meta[key]) != "":
-                        combined_meta[key] = ", ".join(
-                            [str(combined_meta[key]), str(value)]
-                        )
-                    else:
-                        combined_meta[key] = str(value)
-            return combined_meta
-        return {}
+        return self.summarize_labels(access_labels)[1]
+
+    def summarize_labels(self, access_labels):
+        """Combines the descriptions and the metadata of access labels in one pass.
+
+        Args:
+            access_labels (array): Array of access labels.
+
+        Returns:
+            tuple: Comma seperated access label descriptions and dictionary of
+                   comma seperated access label values per key.
+        """
+        if not access_labels:
+            return "", {}
+        label_desc_array = []
+        meta_values = {"action": [], "account": [], "group": []}
+        for label in access_labels:
+            label_desc_array.append(self.get_label_desc(label))
+            for key, value in label.items():
+                values = meta_values[key]
+                value = str(value)
+                if values or value != "":
+                    values.append(value)
+        combined_meta = {key: ", ".join(values) for key, values in meta_values.items()}
+        return ", ".join(label_desc_array), combined_meta
 
     def access_request_data(self, request, is_group=False):
         """Creates a dictionary of aws accounts.
@@ -195,6 +246,7 @@ class AWSAccess(BaseEmailAccess):
         Returns:
             dict: Dictionary of AWS accounts.
         """
+        helpers.prefetch_aws_group_catalogs()
         return dict({"accounts": helpers.get_aws_accounts()})
 
     def revoke(self, user, user_identity, label, request):
@@ -244,6 +296,7 @@ class AWSAccess(BaseEmailAccess):
             arr: Array of the access labels for the request access.
         """
         valid_access_label_array = []
+        account_groups = {}
         for access_label_data in access_labels_data:
             if (
                 not access_label_data.get("action")
@@ -252,24 +305,31 @@ class AWSAccess(BaseEmailAccess):
                 raise AWSModuleValidationError(
                     constants.ERROR_MESSAGES["valid_action_required"]
                 )
-            if not access_label_data.get("account") and not helpers.aws_account_exists(
+            if not access_label_data.get("account") or not helpers.aws_account_exists(
                 access_label_data.get("account")
             ):
                 raise AWSModuleValidationError(
                     constants.ERROR_MESSAGES["valid_account_required"]
                 )
-            if not access_label_data.get("group") and not helpers.aws_group_exists(
-                access_label_data["account"], access_label_data.get("group")
-            ):
+            if not access_label_data.get("group"):
                 raise AWSModuleValidationError(
                     constants.ERROR_MESSAGES["valid_group_required"]
                 )
+            account_groups.setdefault(access_label_data["account"], []).append(
+                access_label_data["group"]
+            )
             valid_access_label = {
                 "action": access_label_data.get("action"),
                 "account": access_label_data.get("account"),
                 "group": access_label_data.get("group"),
             }
             valid_access_label_array.append(valid_access_label)
+
+        for account, groups in account_groups.items():
+            if not all(helpers.aws_groups_exist(account, groups).values()):
+                raise AWSModuleValidationError(
+                    constants.ERROR_MESSAGES["valid_group_required"]
+                )
         return valid_access_label_array
 
     def fetch_access_request_form_path(self):
@@ -1,9 +1,49 @@
 AWS_ACCESS = "aws_access"
 IAM_RESOURCE = "iam"
+STS_RESOURCE = "sts"
+HUB_ACCOUNT = "__hub__"
 GROUP_ACCESS = "GroupAccess"
+DEFAULT_MAX_POOL_CONNECTIONS = 10
+DEFAULT_MAX_PARALLEL_CALLS = 10
+DEFAULT_MAX_PARALLEL_ACCOUNTS = 10
+DEFAULT_GROUP_CATALOG_TTL = 300
+DEFAULT_GROUP_PAGE_SIZE = 100
+MAX_LIST_GROUPS_PAGE_SIZE = 1000
+GROUP_SEARCH_PREFIX = "prefix"
+DEFAULT_GROUP_EXISTS_TTL = 300
+DEFAULT_GROUP_MISSING_TTL = 30
+MAX_GROUP_EXISTS_ENTRIES = 10000
+GROUP_CATALOG_SWEEP_THRESHOLD = 5
+DEFAULT_RATE_LIMIT = 10
+DEFAULT_RATE_LIMIT_BURST = 20
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_RETRY_BASE_DELAY = 0.2
+DEFAULT_RETRY_MAX_DELAY = 5
+ASSUME_ROLE_SESSION_NAME = "enigma-access"
+DEFAULT_ASSUME_ROLE_DURATION = 3600
+ASSUME_ROLE_REFRESH_WINDOW = 300
+ASSUME_ROLE_EXPIRY_MARGIN = 60
+METRICS_PREFIX = "aws_access.iam"
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DEFAULT_NOTIFICATION_WORKERS = 2
+DEFAULT_NOTIFICATION_RETRIES = 3
+NOTIFICATION_RETRY_DELAY = 1
+RETRYABLE_ERROR_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "RequestLimitExceeded",
+    "ServiceUnavailable",
+    "ServiceUnavailableException",
+}
+
+MAX_PATH_PREFIX_LENGTH = 512
 
 ERROR_MESSAGES = {
     "valid_action_required": "Valid action is required for AWS access",
     "valid_account_required": "Valid account name is required for AWS access",
     "valid_group_required": "Valid group name is required for AWS access",
+    "valid_page_size_required": "Page size must be a number between 1 and 1000",
+    "user_not_found": "AWS user %s does not exist in account %s",
+    "list_groups_failed": "Could not list the AWS groups of the account",
+    "valid_path_prefix_required": "Path prefix must be an IAM path starting and ending with /",
 }
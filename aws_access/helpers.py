@@ -1,6 +1,18 @@
 """aws helpers functions"""
+import collections
+import json
 import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import boto3
+from botocore.config import Config
+from botocore.exceptions import ConnectionError as BotocoreConnectionError
+from botocore.exceptions import HTTPClientError
 
 from EnigmaAutomation.settings import ACCESS_MODULES
 from . import constants
@@ -8,6 +20,384 @@ from . import constants
 logger = logging.getLogger(__name__)
 
 
+class _AWSClientPool:
+    """Process wide pool of AWS clients keyed by (account, resource).
+
+    A pooled client is rebuilt when the fingerprint it was created with
+    (credentials and client settings) no longer matches the config.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, fingerprint, factory):
+        """Returns the pooled client for key, creating it with factory if needed."""
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry and entry[0] == fingerprint:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            client = factory()
+            self._clients[key] = (fingerprint, client)
+            return client
+
+    def clear(self):
+        """Drops all pooled clients and resets the counters."""
+        with self._lock:
+            self._clients = {}
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Returns hit/miss counters and the number of pooled clients."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._clients)}
+
+
+_client_pool = _AWSClientPool()
+
+
+class _AWSGroupCatalog:
+    """In memory catalog of AWS group names per account.
+
+    An account's groups are loaded by paging through list_groups once.
+    Entries older than the configured TTL are still served while a
+    background refresh replaces them. When group_catalog_snapshot_path is
+    configured, the catalog is saved there after every refresh and loaded
+    from there on first use, so a new process serves groups straight away.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_loaded = False
+        self._entries = {}
+        self._loading = {}
+
+    def get(self, account):
+        """Returns (names, lowercased names) for account, loading them on first use."""
+        self._load_snapshot()
+        entry = self._entries.get(account)
+        if entry is None:
+            return self.refresh(account)
+        if self._is_stale(entry):
+            self.refresh_in_background(account)
+        return entry[1], entry[2]
+
+    def is_fresh(self, account):
+        """Returns True if the account groups are loaded and within the TTL."""
+        self._load_snapshot()
+        entry = self._entries.get(account)
+        return entry is not None and not self._is_stale(entry)
+
+    def refresh(self, account):
+        """Loads the account groups, joining a refresh that is already running.
+
+        Only configured accounts are loaded, so the catalog can not be grown
+        with arbitrary account names.
+        """
+        if not aws_account_exists(account):
+            raise Exception(constants.ERROR_MESSAGES["valid_account_required"])
+        with self._lock:
+            event = self._loading.get(account)
+            is_owner = event is None
+            if is_owner:
+                event = self._loading[account] = threading.Event()
+
+        if not is_owner:
+            event.wait()
+            entry = self._entries.get(account)
+            if entry is None:
+                raise Exception("Could not load the AWS groups of " + account)
+            return entry[1], entry[2]
+
+        try:
+            groups = tuple(
+                iter_aws_groups(account, page_size=constants.MAX_LIST_GROUPS_PAGE_SIZE)
+            )
+            lowered = tuple(group.lower() for group in groups)
+            with self._lock:
+                self._entries[account] = (time.time(), groups, lowered)
+            self._write_snapshot()
+            return groups, lowered
+        finally:
+            with self._lock:
+                del self._loading[account]
+            event.set()
+
+    def refresh_in_background(self, account):
+        """Starts a background refresh unless one is already running."""
+        with self._lock:
+            if account in self._loading:
+                return
+        threading.Thread(
+            target=self._refresh_quietly, args=(account,), daemon=True
+        ).start()
+
+    def clear(self):
+        """Drops all catalog entries."""
+        with self._lock:
+            self._entries = {}
+
+    def _refresh_quietly(self, account):
+        try:
+            self.refresh(account)
+        except Exception as ex:
+            logger.error("Could not refresh AWS groups for %s: %s", account, str(ex))
+
+    def _load_snapshot(self):
+        """Loads the catalog snapshot once, keeping its load timestamps."""
+        if self._snapshot_loaded:
+            return
+        with self._snapshot_lock:
+            if self._snapshot_loaded:
+                return
+            path = _get_aws_config().get("group_catalog_snapshot_path")
+            if path and os.path.exists(path):
+                try:
+                    with open(path) as snapshot:
+                        for line in snapshot:
+                            if not line.strip():
+                                continue
+                            record = json.loads(line)
+                            if not aws_account_exists(record["account"]):
+                                continue
+                            groups = tuple(record["groups"])
+                            entry = (
+                                record["loaded_at"],
+                                groups,
+                                tuple(group.lower() for group in groups),
+                            )
+                            with self._lock:
+                                self._entries.setdefault(record["account"], entry)
+                except Exception as ex:
+                    logger.error(
+                        "Could not load AWS group catalog snapshot %s: %s", path, str(ex)
+                    )
+            self._snapshot_loaded = True
+
+    def _write_snapshot(self):
+        """Writes the catalog as json lines, replacing the previous snapshot."""
+        path = _get_aws_config().get("group_catalog_snapshot_path")
+        if not path:
+            return
+        with self._lock:
+            entries = list(self._entries.items())
+        temp_path = None
+        try:
+            with self._snapshot_lock:
+                # a unique file per write, as concurrent writers may be other processes
+                fd, temp_path = tempfile.mkstemp(
+                    dir=os.path.dirname(path) or ".",
+                    prefix=os.path.basename(path) + ".",
+                    suffix=".tmp",
+                )
+                with os.fdopen(fd, "w") as snapshot:
+                    for account, entry in entries:
+                        snapshot.write(
+                            json.dumps(
+                                {
+                                    "account": account,
+                                    "loaded_at": entry[0],
+                                    "groups": entry[1],
+                                }
+                            )
+                            + "\n"
+                        )
+                os.replace(temp_path, path)
+        except Exception as ex:
+            logger.error(
+                "Could not write AWS group catalog snapshot %s: %s", path, str(ex)
+            )
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _is_stale(self, entry):
+        ttl = _get_aws_config().get(
+            "group_catalog_ttl", constants.DEFAULT_GROUP_CATALOG_TTL
+        )
+        return time.time() - entry[0] > ttl
+
+
+_group_catalog = _AWSGroupCatalog()
+
+
+class _AWSGroupExistsCache:
+    """TTL cache of AWS group existence keyed by (account, group).
+
+    Groups that exist and groups that do not exist are cached with
+    separate TTLs, so a group created after a miss is found again soon.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, account, group):
+        """Returns the cached existence of the group, None if unknown."""
+        entry = self._entries.get((account, group))
+        if entry is None or entry[0] < time.time():
+            return None
+        return entry[1]
+
+    def set(self, account, group, exists):
+        """Caches the existence of the group."""
+        config = _get_aws_config()
+        if exists:
+            ttl = config.get("group_exists_ttl", constants.DEFAULT_GROUP_EXISTS_TTL)
+        else:
+            ttl = config.get("group_missing_ttl", constants.DEFAULT_GROUP_MISSING_TTL)
+        now = time.time()
+        with self._lock:
+            if len(self._entries) >= constants.MAX_GROUP_EXISTS_ENTRIES:
+                self._entries = {
+                    key: entry for key, entry in self._entries.items() if entry[0] >= now
+                }
+            self._entries[(account, group)] = (now + ttl, exists)
+
+    def clear(self):
+        """Drops all cached entries."""
+        with self._lock:
+            self._entries = {}
+
+
+_group_exists_cache = _AWSGroupExistsCache()
+
+
+class _TokenBucket:
+    """Token bucket limiting the rate of AWS API calls."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Takes a token, waiting until one is available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+_notification_executor = None
+_metrics_sink = None
+_notification_executor_lock = threading.Lock()
+
+_AWSAccountIndex = collections.namedtuple(
+    "_AWSAccountIndex", ["source", "accounts", "names"]
+)
+_account_index = None
+_account_index_lock = threading.Lock()
+
+
+class _AssumedRoleCredentials:
+    """Cache of temporary credentials of accounts reached by assuming a role.
+
+    Credentials are reused until shortly before they expire and are
+    refreshed in the background once they enter the refresh window.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._account_locks = {}
+        self._refreshing = set()
+
+    def get(self, account, account_data):
+        """Returns the temporary credentials of the account."""
+        role = (account_data["role_arn"], account_data.get("external_id"))
+        entry = self._entries.get(account)
+        now = time.time()
+        if (
+            entry
+            and entry[0] == role
+            and now < entry[2] - constants.ASSUME_ROLE_EXPIRY_MARGIN
+        ):
+            if now >= entry[2] - constants.ASSUME_ROLE_REFRESH_WINDOW:
+                self._refresh_in_background(account, account_data)
+            return entry[1]
+        return self.refresh(account, account_data)
+
+    def refresh(self, account, account_data):
+        """Assumes the account role and caches the temporary credentials."""
+        with self._lock:
+            account_lock = self._account_locks.setdefault(account, threading.Lock())
+        with account_lock:
+            role = (account_data["role_arn"], account_data.get("external_id"))
+            entry = self._entries.get(account)
+            if (
+                entry
+                and entry[0] == role
+                and time.time() < entry[2] - constants.ASSUME_ROLE_REFRESH_WINDOW
+            ):
+                return entry[1]
+
+            kwargs = {
+                "RoleArn": account_data["role_arn"],
+                "RoleSessionName": account_data.get(
+                    "session_name", constants.ASSUME_ROLE_SESSION_NAME
+                ),
+                "DurationSeconds": account_data.get(
+                    "session_duration", constants.DEFAULT_ASSUME_ROLE_DURATION
+                ),
+            }
+            if account_data.get("external_id"):
+                kwargs["ExternalId"] = account_data["external_id"]
+            response = _call_aws(account, _get_hub_sts_client(), "assume_role", **kwargs)
+            credentials = response["Credentials"]
+            creds = {
+                "aws_access_key_id": credentials["AccessKeyId"],
+                "aws_secret_access_key": credentials["SecretAccessKey"],
+                "aws_session_token": credentials["SessionToken"],
+            }
+            self._entries[account] = (role, creds, credentials["Expiration"].timestamp())
+            return creds
+
+    def clear(self):
+        """Drops all cached credentials."""
+        with self._lock:
+            self._entries = {}
+
+    def _refresh_in_background(self, account, account_data):
+        with self._lock:
+            if account in self._refreshing:
+                return
+            self._refreshing.add(account)
+        threading.Thread(
+            target=self._refresh_quietly, args=(account, account_data), daemon=True
+        ).start()
+
+    def _refresh_quietly(self, account, account_data):
+        try:
+            self.refresh(account, account_data)
+        except Exception as ex:
+            logger.error("Could not assume AWS role for %s: %s", account, str(ex))
+        finally:
+            with self._lock:
+                self._refreshing.discard(account)
+
+
+_assumed_role_credentials = _AssumedRoleCredentials()
+
+
 def aws_account_exists(account):
     """Checks if AWS Account exists.
 
@@ -18,14 +408,15 @@ def aws_account_exists(account):
         bool: True if account exists.
               False if account does not exist.
     """
-    if not _get_aws_credentails(account):
-        return False
-    return True
+    return account in _get_aws_account_index().accounts
 
 
 def aws_group_exists(account, group):
     """Checks if aws group exists.
 
+    Only a NoSuchEntity error is remembered as a missing group, other errors
+    are not cached.
+
     Args:
         account (str): AWS Account name.
         group (str): AWS Group name.
@@ -34,13 +425,74 @@ def aws_group_exists(account, group):
         str: True if AWS Group exists.
              False if AWS Group does not exists.
     """
-    client = get_aws_client(account=account, resource=constants.IAM_RESOURCE)
+    exists = _group_exists_cache.get(account, group)
+    if exists is not None:
+        return exists
+
+    if _group_catalog.is_fresh(account) and group in _group_catalog.get(account)[0]:
+        exists = True
+    else:
+        try:
+            client = get_aws_client(account=account, resource=constants.IAM_RESOURCE)
+            _call_aws(account, client, "get_group", GroupName=group)
+            exists = True
+        except Exception as ex:
+            logger.error(str(ex))
+            if _get_error_code(ex) != "NoSuchEntity":
+                return False
+            exists = False
+    _group_exists_cache.set(account, group, exists)
+    return exists
+
+
+def aws_groups_exist(account, groups):
+    """Checks if multiple aws groups exist in an account.
+
+    Groups that are not cached are looked up in the group catalog, which
+    is loaded with a single list_groups sweep when many groups are unknown.
+    Groups missing from the catalog, or all of them when the catalog can not
+    be loaded, are confirmed with aws_group_exists.
+
+    Args:
+        account (str): AWS Account name.
+        groups (list): AWS Group names.
+
+    Returns:
+        dict: AWS Group name to True if the group exists, False otherwise.
+    """
+    result = {}
+    unknown_groups = []
+    for group in groups:
+        exists = _group_exists_cache.get(account, group)
+        if exists is None:
+            unknown_groups.append(group)
+        else:
+            result[group] = exists
+
+    if len(unknown_groups) >= constants.GROUP_CATALOG_SWEEP_THRESHOLD or (
+        unknown_groups and _group_catalog.is_fresh(account)
+    ):
+        catalog_groups = _get_catalog_groups(account)
+        for group in unknown_groups:
+            if group in catalog_groups:
+                _group_exists_cache.set(account, group, True)
+                result[group] = True
+
+    for group in unknown_groups:
+        if group not in result:
+            result[group] = aws_group_exists(account, group)
+    return result
+
+
+def _get_catalog_groups(account):
+    """Gets the group names of the account catalog, empty if it can't be loaded."""
     try:
-        client.get_group(GroupName=group)
+        if _group_catalog.is_fresh(account):
+            return set(_group_catalog.get(account)[0])
+        return set(_group_catalog.refresh(account)[0])
     except Exception as ex:
-        logger.error(str(ex))
-        return False
-    return True
+        logger.error("Could not list AWS groups for %s: %s", account, str(ex))
+        return set()
 
 
 def _get_aws_config():
@@ -49,24 +501,55 @@ def _get_aws_config():
     return ACCESS_MODULES.get("aws_access", {})
 
 
-def _get_aws_credentails(account):
-    """Get AWS API credentials."""
-    aws_access_config = _get_aws_config()
-    accounts = aws_access_config.get("aws_accounts", [])
-    for account_data in accounts:
-        if account_data["account"] == account:
-            return dict(
-                {
-                    "aws_access_key_id": account_data["access_key_id"],
-                    "aws_secret_access_key": account_data["secret_access_key"],
-                }
+def _get_aws_account_index():
+    """Gets the AWS account index.
+
+    The index is built once from the configured aws_accounts and rebuilt
+    only when the config object is replaced.
+    """
+    global _account_index
+    accounts = _get_aws_config().get("aws_accounts", ())
+    index = _account_index
+    if index is not None and index.source is accounts:
+        return index
+    with _account_index_lock:
+        if _account_index is None or _account_index.source is not accounts:
+            account_map = {}
+            for account_data in accounts:
+                account_map.setdefault(account_data["account"], account_data)
+            _account_index = _AWSAccountIndex(
+                source=accounts,
+                accounts=account_map,
+                names=tuple(account_data["account"] for account_data in accounts),
             )
-    return {}
+        return _account_index
+
+
+def _get_aws_credentails(account):
+    """Get AWS API credentials.
+
+    Accounts configured with a role_arn get temporary credentials by
+    assuming the role from the hub account.
+    """
+    account_data = _get_aws_account_index().accounts.get(account)
+    if not account_data:
+        return {}
+    if account_data.get("role_arn"):
+        return _assumed_role_credentials.get(account, account_data)
+    return dict(
+        {
+            "aws_access_key_id": account_data["access_key_id"],
+            "aws_secret_access_key": account_data["secret_access_key"],
+        }
+    )
 
 
 def get_aws_client(account, resource):
     """Gets AWS client for api access.
 
+    Clients are pooled per (account, resource) and reused until the
+    account credentials or client settings change.
+
     Args:
         account (str): AWS Account Name.
         resource (str): Resource Name.
@@ -75,7 +558,190 @@ def get_aws_client(account, resource):
         client: AWS Session client.
     """
     creds = _get_aws_credentails(account=account)
-    return boto3.client(resource, **creds)
+    client_config, client_kwargs = _get_aws_client_settings(account)
+    fingerprint = (
+        tuple(sorted(creds.items())),
+        json.dumps(client_config, sort_keys=True),
+        tuple(sorted(client_kwargs.items())),
+    )
+    return _client_pool.get(
+        (account, resource),
+        fingerprint,
+        lambda: boto3.client(
+            resource, config=Config(**client_config), **client_kwargs, **creds
+        ),
+    )
+
+
+def _get_aws_client_settings(account):
+    """Gets the botocore config and client arguments of an AWS account.
+
+    The client_config of the account overrides the module wide
+    client_config, and the connection pool is sized for max_parallel_calls
+    unless max_pool_connections is set.
+    """
+    aws_config = _get_aws_config()
+    account_data = _get_aws_account_index().accounts.get(account, {})
+    client_config = {
+        "max_pool_connections": aws_config.get(
+            "max_pool_connections",
+            max(
+                constants.DEFAULT_MAX_POOL_CONNECTIONS,
+                aws_config.get(
+                    "max_parallel_calls", constants.DEFAULT_MAX_PARALLEL_CALLS
+                ),
+            ),
+        ),
+        "retries": {"mode": "standard", "max_attempts": 1},
+    }
+    client_config.update(aws_config.get("client_config", {}))
+    client_config.update(account_data.get("client_config", {}))
+
+    client_kwargs = {}
+    for key in ("endpoint_url", "region_name"):
+        value = account_data.get(key, aws_config.get(key))
+        if value:
+            client_kwargs[key] = value
+    return client_config, client_kwargs
+
+
+def _get_hub_sts_client():
+    """Gets the pooled STS client of the hub account used to assume roles."""
+    hub_account = _get_aws_config().get("hub_account", {})
+    creds = {}
+    if hub_account.get("access_key_id"):
+        creds = {
+            "aws_access_key_id": hub_account["access_key_id"],
+            "aws_secret_access_key": hub_account["secret_access_key"],
+        }
+    return _client_pool.get(
+        (constants.HUB_ACCOUNT, constants.STS_RESOURCE),
+        tuple(sorted(creds.items())),
+        lambda: boto3.client(constants.STS_RESOURCE, **creds),
+    )
+
+
+def get_aws_client_pool_stats():
+    """Gets the AWS client pool counters.
+
+    Returns:
+        dict: Pool hits, misses and number of pooled clients.
+    """
+    return _client_pool.stats()
+
+
+def clear_aws_client_pool():
+    """Drops all pooled AWS clients."""
+    _client_pool.clear()
+
+
+def _paginate(account, client, operation, result_key, **kwargs):
+    """Yields the items of a marker paginated AWS API operation page by page."""
+    while True:
+        page = _call_aws(account, client, operation, **kwargs)
+        yield from page.get(result_key, [])
+        if not page.get("IsTruncated"):
+            return
+        kwargs["Marker"] = page["Marker"]
+
+
+def _get_rate_limiter(account):
+    """Gets the token bucket of an AWS account, rebuilding it if its config changed."""
+    config = _get_aws_config()
+    rate = config.get("rate_limit", constants.DEFAULT_RATE_LIMIT)
+    capacity = config.get("rate_limit_burst", constants.DEFAULT_RATE_LIMIT_BURST)
+    limiter = _rate_limiters.get(account)
+    if limiter is None or limiter.rate != rate or limiter.capacity != capacity:
+        with _rate_limiters_lock:
+            limiter = _rate_limiters.get(account)
+            if limiter is None or limiter.rate != rate or limiter.capacity != capacity:
+                limiter = _rate_limiters[account] = _TokenBucket(rate, capacity)
+    return limiter
+
+
+def _call_aws(account, client, operation, **kwargs):
+    """Makes an AWS API call within the account rate limit.
+
+    Throttling, server and connection errors are retried with exponential
+    backoff and full jitter, up to max_retries times. botocore's own retries
+    are turned off, so this is the only retry policy of the clients.
+    """
+    config = _get_aws_config()
+    max_retries = config.get("max_retries", constants.DEFAULT_MAX_RETRIES)
+    base_delay = config.get("retry_base_delay", constants.DEFAULT_RETRY_BASE_DELAY)
+    max_delay = config.get("retry_max_delay", constants.DEFAULT_RETRY_MAX_DELAY)
+    limiter = _get_rate_limiter(account)
+    sink = _metrics_sink
+    start = time.perf_counter() if sink is not None else 0
+    attempt = 0
+    while True:
+        limiter.acquire()
+        try:
+            response = getattr(client, operation)(**kwargs)
+        except Exception as ex:
+            error_code = _get_error_code(ex) or type(ex).__name__
+            if attempt >= max_retries or not _is_retryable_error(ex):
+                if sink is not None:
+                    duration = time.perf_counter() - start
+                    _record_metric(sink, account, operation, duration, False, attempt)
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            logger.warning(
+                "AWS %s in %s failed with %s, retrying in %.2fs",
+                operation, account, error_code, delay
+            )
+            time.sleep(delay)
+            attempt += 1
+        else:
+            if sink is not None:
+                duration = time.perf_counter() - start
+                _record_metric(sink, account, operation, duration, True, attempt)
+            return response
+
+
+def _is_retryable_error(ex):
+    """Checks if an AWS API call failed with a throttling, 5xx or transport error."""
+    if isinstance(ex, (BotocoreConnectionError, HTTPClientError)):
+        return True
+    if _get_error_code(ex) in constants.RETRYABLE_ERROR_CODES:
+        return True
+    response = getattr(ex, "response", None) or {}
+    status = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    return status is not None and status >= 500
+
+
+def _record_metric(sink, account, operation, duration, success, retries):
+    """Records an AWS API call on the metrics sink, never failing the call."""
+    try:
+        sink.record(account, operation, duration, success, retries)
+    except Exception as ex:
+        logger.error("Could not record AWS API metric: %s", str(ex))
+
+
+def set_aws_metrics_sink(sink):
+    """Sets the sink recording every AWS API call made by the helpers.
+
+    Args:
+        sink (object): Sink with a record(account, operation, duration,
+                       success, retries) method, such as the sinks in
+                       aws_access.metrics. None disables the instrumentation.
+    """
+    global _metrics_sink
+    _metrics_sink = sink
+
+
+def get_aws_metrics_sink():
+    """Gets the sink recording AWS API calls.
+
+    Returns:
+        object: The metrics sink, None if the instrumentation is disabled.
+    """
+    return _metrics_sink
+
+
+def _get_error_code(ex):
+    """Gets the AWS error code of an exception raised by a boto3 client."""
+    return (getattr(ex, "response", None) or {}).get("Error", {}).get("Code", "")
 
 
 def __get_username(email):
@@ -95,7 +761,13 @@ def grant_aws_access(user, account, group):
     """
     try:
         client = get_aws_client(account=account, resource=constants.IAM_RESOURCE)
-        client.add_user_to_group(GroupName=group, UserName=__get_username(user.email))
+        _call_aws(
+            account,
+            client,
+            "add_user_to_group",
+            GroupName=group,
+            UserName=__get_username(user.email),
+        )
     except Exception as ex:
         logger.exception("Exception while adding user to AWS group: " + str(ex))
         return False, str(ex)
@@ -115,8 +787,12 @@ def revoke_aws_access(user, account, group):
     """
     try:
         client = get_aws_client(account=account, resource=constants.IAM_RESOURCE)
-        client.remove_user_from_group(
-            GroupName=group, UserName=__get_username(user.email)
+        _call_aws(
+            account,
+            client,
+            "remove_user_from_group",
+            GroupName=group,
+            UserName=__get_username(user.email),
         )
     except Exception as ex:
         logger.error("Exception while removing user from AWS group: " + str(ex))
@@ -124,17 +800,336 @@ def revoke_aws_access(user, account, group):
     return True, ""
 
 
+def grant_aws_access_batch(user, labels):
+    """Make AWS API calls to grant access to a user to multiple groups.
+
+    The grants run in parallel on a bounded thread pool. The user's groups
+    are listed before granting, and if any grant fails only the groups added
+    by the batch are revoked again. Groups of accounts whose groups could not
+    be listed are never revoked, since the user may already have had them.
+
+    Args:
+        user (User): User whose access is being granted.
+        labels (list): Access labels with the account and group to grant.
+
+    Returns:
+        tuple: True if every grant succeeds, False otherwise, along with a
+               list of (label, granted, exception) results in label order.
+    """
+    if not labels:
+        return True, []
+
+    max_workers = min(
+        len(labels),
+        _get_aws_config().get("max_parallel_calls", constants.DEFAULT_MAX_PARALLEL_CALLS),
+    )
+    accounts = list({label["account"]: None for label in labels})
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        account_groups = executor.map(
+            lambda account: _get_current_aws_groups(user, account), accounts
+        )
+        current_groups = dict(zip(accounts, account_groups))
+        outcomes = executor.map(
+            lambda label: grant_aws_access(user, label["account"], label["group"]),
+            labels,
+        )
+        results = [
+            (label, granted, exception)
+            for label, (granted, exception) in zip(labels, outcomes)
+        ]
+        if all(granted for _, granted, _ in results):
+            return True, results
+
+        granted_labels = [
+            label
+            for label, granted, _ in results
+            if granted
+            and current_groups[label["account"]] is not None
+            and label["group"] not in current_groups[label["account"]]
+        ]
+        rollbacks = executor.map(
+            lambda label: revoke_aws_access(user, label["account"], label["group"]),
+            granted_labels,
+        )
+        for label, (revoked, exception) in zip(granted_labels, rollbacks):
+            if not revoked:
+                logger.error(
+                    "Could not roll back %s from AWS group %s: %s",
+                    user.email, label["group"], exception
+                )
+    return False, results
+
+
+def _get_current_aws_groups(user, account):
+    """Gets the groups a user is a member of, None if they can't be listed."""
+    username = __get_username(user.email)
+    try:
+        client = get_aws_client(account=account, resource=constants.IAM_RESOURCE)
+        return _list_aws_user_groups(account, client, username)
+    except Exception as ex:
+        if _get_error_code(ex) == "NoSuchEntity":
+            return set()
+        logger.error(
+            "Exception while listing AWS groups of %s in %s: %s",
+            user.email, account, str(ex)
+        )
+        return None
+
+
+def _list_aws_user_groups(account, client, username):
+    """Lists the names of the groups of an AWS user."""
+    return {
+        group["GroupName"]
+        for group in _paginate(
+            account, client, "list_groups_for_user", "Groups", UserName=username
+        )
+    }
+
+
+def plan_aws_grants(user, labels):
+    """Works out which AWS group grants are needed, without making any change.
+
+    Per account, the IAM user is looked up with get_user, its current groups
+    are listed with list_groups_for_user and the requested groups are checked
+    with aws_groups_exist. Accounts are checked in parallel.
+
+    Args:
+        user (User): User whose access would be granted.
+        labels (list): Access labels with the account and group to grant.
+
+    Returns:
+        dict: Labels that need to be granted, labels that are already
+              granted and (label, reason) pairs of labels that can not be
+              granted.
+    """
+    plan = {"grant": [], "skip": [], "invalid": []}
+    account_labels = {}
+    for label in labels:
+        account_labels.setdefault(label["account"], []).append(label)
+    if not account_labels:
+        return plan
+
+    accounts = list(account_labels)
+    max_workers = min(
+        len(accounts),
+        _get_aws_config().get(
+            "max_parallel_accounts", constants.DEFAULT_MAX_PARALLEL_ACCOUNTS
+        ),
+    )
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        account_plans = executor.map(
+            lambda account: _plan_aws_account_grants(
+                user, account, account_labels[account]
+            ),
+            accounts,
+        )
+        for account_plan in account_plans:
+            for key, value in account_plan.items():
+                plan[key].extend(value)
+    return plan
+
+
+def _plan_aws_account_grants(user, account, labels):
+    """Works out the grants needed for labels of a single AWS account."""
+    plan = {"grant": [], "skip": [], "invalid": []}
+    username = __get_username(user.email)
+    try:
+        client = get_aws_client(account=account, resource=constants.IAM_RESOURCE)
+        _call_aws(account, client, "get_user", UserName=username)
+        current_groups = _list_aws_user_groups(account, client, username)
+    except Exception as ex:
+        if _get_error_code(ex) == "NoSuchEntity":
+            reason = constants.ERROR_MESSAGES["user_not_found"] % (username, account)
+        else:
+            logger.error(
+                "Exception while planning AWS grants of %s in %s: %s",
+                user.email, account, str(ex)
+            )
+            reason = str(ex)
+        plan["invalid"].extend((label, reason) for label in labels)
+        return plan
+
+    existing_groups = aws_groups_exist(
+        account,
+        [label["group"] for label in labels if label["group"] not in current_groups],
+    )
+    for label in labels:
+        if label["group"] in current_groups:
+            plan["skip"].append(label)
+        elif existing_groups[label["group"]]:
+            plan["grant"].append(label)
+        else:
+            plan["invalid"].append(
+                (label, constants.ERROR_MESSAGES["valid_group_required"])
+            )
+    return plan
+
+
+def offboard_aws_user(user):
+    """Make AWS API calls to remove a user from every group in every account.
+
+    Accounts are processed in parallel, and the groups of each account are
+    removed in parallel up to max_parallel_calls at a time.
+
+    Args:
+        user (User): User who is being offboarded.
+
+    Returns:
+        dict: Offboarding report with the overall success and, per account,
+              the removed groups, the groups that failed with their error and
+              the error raised while listing the user's groups.
+    """
+    accounts = get_aws_accounts()
+    report = {"user": __get_username(user.email), "success": True, "accounts": {}}
+    if not accounts:
+        return report
+
+    max_workers = min(
+        len(accounts),
+        _get_aws_config().get(
+            "max_parallel_accounts", constants.DEFAULT_MAX_PARALLEL_ACCOUNTS
+        ),
+    )
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        account_reports = executor.map(
+            lambda account: _offboard_aws_account(user, account), accounts
+        )
+        for account, account_report in zip(accounts, account_reports):
+            report["accounts"][account] = account_report
+            if account_report["failed"] or account_report["error"]:
+                report["success"] = False
+    return report
+
+
+def _offboard_aws_account(user, account):
+    """Removes a user from every group of a single AWS account."""
+    account_report = {"removed": [], "failed": {}, "error": ""}
+    try:
+        client = get_aws_client(account=account, resource=constants.IAM_RESOURCE)
+        groups = [
+            group["GroupName"]
+            for group in _paginate(
+                account,
+                client,
+                "list_groups_for_user",
+                "Groups",
+                UserName=__get_username(user.email),
+            )
+        ]
+    except Exception as ex:
+        if _get_error_code(ex) != "NoSuchEntity":
+            logger.error(
+                "Exception while listing AWS groups of %s in %s: %s",
+                user.email, account, str(ex)
+            )
+            account_report["error"] = str(ex)
+        return account_report
+    if not groups:
+        return account_report
+
+    max_workers = min(
+        len(groups),
+        _get_aws_config().get("max_parallel_calls", constants.DEFAULT_MAX_PARALLEL_CALLS),
+    )
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        outcomes = executor.map(
+            lambda group: revoke_aws_access(user, account, group), groups
+        )
+        for group, (revoked, exception) in zip(groups, outcomes):
+            if revoked:
+                account_report["removed"].append(group)
+            else:
+                account_report["failed"][group] = exception
+    return account_report
+
+
+def iter_aws_group_members(account, group):
+    """Yields the user names of an AWS group, fetching one page at a time.
+
+    Args:
+        account (str): AWS Account name.
+        group (str): AWS Group name.
+
+    Yields:
+        str: AWS User name.
+    """
+    client = get_aws_client(account=account, resource=constants.IAM_RESOURCE)
+    for user in _paginate(account, client, "get_group", "Users", GroupName=group):
+        yield user["UserName"]
+
+
+def iter_aws_membership_drift(account, expected_memberships, groups=None):
+    """Yields the differences between AWS group memberships and the expected ones.
+
+    Groups are compared one at a time, so only the members of a single
+    group are held in memory.
+
+    Args:
+        account (str): AWS Account name.
+        expected_memberships (iterable): (user name, group name) pairs that
+                                         are expected to exist.
+        groups (iterable, optional): Groups to compare. Defaults to the
+                                     groups of the expected memberships.
+
+    Yields:
+        tuple: ("extra" or "missing", user name, group name) for memberships
+               that only exist in AWS or only in the expected memberships, and
+               ("failed", error, group name) for groups that could not be read.
+    """
+    expected = {}
+    for user, group in expected_memberships:
+        expected.setdefault(group, set()).add(user)
+    if groups is None:
+        groups = list(expected)
+
+    for group in groups:
+        expected_users = expected.get(group, set())
+        try:
+            actual_users = set(iter_aws_group_members(account, group))
+        except Exception as ex:
+            logger.error(
+                "Exception while reading members of AWS group %s: %s", group, str(ex)
+            )
+            yield "failed", str(ex), group
+            continue
+        for user in sorted(actual_users - expected_users):
+            yield "extra", user, group
+        for user in sorted(expected_users - actual_users):
+            yield "missing", user, group
+
+
+def reconcile_aws_group_memberships(account, expected_memberships, groups=None):
+    """Reports AWS group memberships that drifted from the expected ones.
+
+    Args:
+        account (str): AWS Account name.
+        expected_memberships (iterable): (user name, group name) pairs that
+                                         are expected to exist.
+        groups (iterable, optional): Groups to compare. Defaults to the
+                                     groups of the expected memberships.
+
+    Returns:
+        dict: Lists of extra and missing (user name, group name) pairs and
+              the groups that could not be read with their error.
+    """
+    report = {"extra": [], "missing": [], "failed": {}}
+    for drift, value, group in iter_aws_membership_drift(
+        account, expected_memberships, groups
+    ):
+        if drift == "failed":
+            report["failed"][group] = value
+        else:
+            report[drift].append((value, group))
+    return report
+
+
 def get_aws_accounts():
     """Gets the list of AWS Accounts.
 
     Returns:
-        list: Returns list of Account Names.
+        tuple: Returns tuple of Account Names.
     """
-    accounts = _get_aws_config().get("aws_accounts", [])
-    account_names = []
-    for account in accounts:
-        account_names.append(account["account"])
-    return account_names
+    return _get_aws_account_index().names
 
 
 def get_aws_groups(account, marker):
@@ -149,5 +1144,137 @@ def get_aws_groups(account, marker):
     """
     client = get_aws_client(account=account, resource=constants.IAM_RESOURCE)
     if marker:
-        return client.list_groups(Marker=marker)
-    return client.list_groups()
+        return _call_aws(account, client, "list_groups", Marker=marker)
+    return _call_aws(account, client, "list_groups")
+
+
+def iter_aws_groups(account, path_prefix=None, page_size=None):
+    """Yields the AWS Group names of an account, fetching one page at a time.
+
+    Args:
+        account (str): AWS Account name.
+        path_prefix (str, optional): Only yield groups under this IAM path.
+        page_size (int, optional): Number of groups fetched per AWS API call.
+
+    Yields:
+        str: AWS Group name.
+    """
+    kwargs = {}
+    if path_prefix:
+        kwargs["PathPrefix"] = path_prefix
+    if page_size:
+        kwargs["MaxItems"] = page_size
+    client = get_aws_client(account=account, resource=constants.IAM_RESOURCE)
+    for group in _paginate(account, client, "list_groups", "Groups", **kwargs):
+        yield group["GroupName"]
+
+
+def get_cached_aws_groups(
+    account, marker=None, search=None, match=None, page_size=None
+):
+    """Gets a page of AWS Group names from the in memory group catalog.
+
+    Args:
+        account (str): AWS Account name.
+        marker (str, optional): Marker returned with the previous page.
+        search (str, optional): Case insensitive filter on the group name.
+        match (str, optional): "prefix" to match the start of the group name,
+                               otherwise the search matches anywhere in the name.
+        page_size (int, optional): Number of groups per page.
+
+    Returns:
+        tuple: List of AWS Group names and the marker of the next page,
+               None if there are no more pages.
+    """
+    if not aws_account_exists(account):
+        return [], None
+    groups, lowered = _group_catalog.get(account)
+    if search:
+        search = search.lower()
+        if match == constants.GROUP_SEARCH_PREFIX:
+            groups = [
+                group for group, name in zip(groups, lowered) if name.startswith(search)
+            ]
+        else:
+            groups = [group for group, name in zip(groups, lowered) if search in name]
+
+    start = int(marker) if marker and marker.isdigit() else 0
+    end = start + (page_size or constants.DEFAULT_GROUP_PAGE_SIZE)
+    next_marker = str(end) if end < len(groups) else None
+    return list(groups[start:end]), next_marker
+
+
+def prefetch_aws_group_catalogs():
+    """Loads the group catalog of every AWS Account in the background."""
+    for account in get_aws_accounts():
+        if not _group_catalog.is_fresh(account):
+            _group_catalog.refresh_in_background(account)
+
+
+def clear_aws_group_catalog():
+    """Drops the in memory AWS group catalog and group existence cache."""
+    _group_catalog.clear()
+    _group_exists_cache.clear()
+
+
+def plan_grants_enabled():
+    """Checks if approvals skip the groups a user is already a member of.
+
+    Returns:
+        bool: True if plan_grants is enabled in the config.
+    """
+    return bool(_get_aws_config().get("plan_grants", False))
+
+
+def async_notifications_enabled():
+    """Checks if access notifications are sent in the background.
+
+    Returns:
+        bool: True if async_notifications is enabled in the config.
+    """
+    return bool(_get_aws_config().get("async_notifications", False))
+
+
+def dispatch_notification(send, *args):
+    """Sends a notification on the background notification workers.
+
+    The send is retried with exponential backoff up to notification_retries
+    times before the failure is logged.
+
+    Args:
+        send (callable): Function sending the notification.
+        *args: Arguments passed to send.
+
+    Returns:
+        Future: Future of the notification delivery.
+    """
+    global _notification_executor
+    if _notification_executor is None:
+        with _notification_executor_lock:
+            if _notification_executor is None:
+                _notification_executor = ThreadPoolExecutor(
+                    max_workers=_get_aws_config().get(
+                        "notification_workers", constants.DEFAULT_NOTIFICATION_WORKERS
+                    ),
+                    thread_name_prefix="aws-access-notifications",
+                )
+    return _notification_executor.submit(_send_notification, send, *args)
+
+
+def _send_notification(send, *args):
+    """Sends a notification, retrying failures with exponential backoff."""
+    retries = _get_aws_config().get(
+        "notification_retries", constants.DEFAULT_NOTIFICATION_RETRIES
+    )
+    for attempt in range(retries + 1):
+        try:
+            send(*args)
+            return True
+        except Exception as ex:
+            if attempt == retries:
+                logger.exception("Could not send notification for error %s", str(ex))
+                return False
+            logger.warning(
+                "Could not send notification for error %s, retrying", str(ex)
+            )
+            time.sleep(constants.NOTIFICATION_RETRY_DELAY * 2 ** attempt)
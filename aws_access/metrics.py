@@ -0,0 +1,95 @@
+"""aws api call metric sinks"""
+import bisect
+import logging
+import threading
+
+from . import constants
+
+logger = logging.getLogger(__name__)
+
+
+class LoggingMetricsSink:
+    """Logs every AWS API call."""
+
+    def record(self, account, operation, duration, success, retries):
+        """Records a single AWS API call.
+
+        Args:
+            account (str): AWS Account name.
+            operation (str): AWS API operation name.
+            duration (float): Seconds spent in the call, including retries.
+            success (bool): Whether the call succeeded.
+            retries (int): Number of times the call was retried.
+        """
+        logger.info(
+            "AWS %s in %s took %.3fs, success: %s, retries: %s",
+            operation, account, duration, success, retries
+        )
+
+
+class CallbackMetricsSink:
+    """Reports AWS API calls to a statsd style callback.
+
+    The callback is called as callback(metric_type, name, value, tags) with
+    metric_type "increment" or "timing" and tags holding the account and
+    operation of the call.
+    """
+
+    def __init__(self, callback, prefix=constants.METRICS_PREFIX):
+        self.callback = callback
+        self.prefix = prefix
+
+    def record(self, account, operation, duration, success, retries):
+        """Records a single AWS API call."""
+        tags = {"account": account, "operation": operation}
+        self.callback("increment", self.prefix + ".calls", 1, tags)
+        self.callback("timing", self.prefix + ".latency", duration * 1000, tags)
+        if not success:
+            self.callback("increment", self.prefix + ".errors", 1, tags)
+        if retries:
+            self.callback("increment", self.prefix + ".retries", retries, tags)
+
+
+class InMemoryMetricsSink:
+    """Keeps counters and latency histograms per (account, operation)."""
+
+    def __init__(self, buckets=constants.LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def record(self, account, operation, duration, success, retries):
+        """Records a single AWS API call."""
+        bucket = bisect.bisect_left(self.buckets, duration)
+        with self._lock:
+            metrics = self._metrics.get((account, operation))
+            if metrics is None:
+                metrics = self._metrics[(account, operation)] = {
+                    "calls": 0,
+                    "errors": 0,
+                    "retries": 0,
+                    "total_duration": 0.0,
+                    "histogram": [0] * (len(self.buckets) + 1),
+                }
+            metrics["calls"] += 1
+            metrics["errors"] += 0 if success else 1
+            metrics["retries"] += retries
+            metrics["total_duration"] += duration
+            metrics["histogram"][bucket] += 1
+
+    def snapshot(self):
+        """Returns a copy of the metrics keyed by (account, operation).
+
+        Histogram counts are per latency bucket upper bound in seconds, the
+        last count being the calls slower than the largest bucket.
+        """
+        with self._lock:
+            return {
+                key: dict(metrics, histogram=list(metrics["histogram"]))
+                for key, metrics in self._metrics.items()
+            }
+
+    def reset(self):
+        """Drops all recorded metrics."""
+        with self._lock:
+            self._metrics = {}
@@ -1,7 +1,13 @@
 """aws access module unit tests"""
+import datetime
+import json
+import os
+import time
+
 import pytest
+from botocore.exceptions import EndpointConnectionError, ReadTimeoutError
 
-from . import constants, helpers, access
+from . import constants, helpers, access, metrics, views
 
 
 class MockBoto3:
@@ -38,6 +44,46 @@ class MockBoto3:
         }
 
 
+class MockBoto3withPages(MockBoto3):
+    """Mock for boto3 with paginated groups"""
+
+    def __init__(self, group_names, page_size):
+        self.group_names = group_names
+        self.page_size = page_size
+        self.calls = 0
+
+    # Follows boto3 signature
+    def list_groups(self, Marker=None, MaxItems=None, PathPrefix="/"):
+        """mock method returns a page of the group list"""
+        self.calls += 1
+        start = int(Marker or 0)
+        end = start + self.page_size
+        return {
+            "Groups": [
+                {"GroupName": group_name}
+                for group_name in self.group_names[start:end]
+                if group_name.startswith(PathPrefix.strip("/"))
+            ],
+            "IsTruncated": end < len(self.group_names),
+            "Marker": str(end),
+        }
+
+
+class MockBoto3withGetGroup(MockBoto3withPages):
+    """Mock for boto3 recording get_group calls"""
+
+    def __init__(self, group_names, page_size):
+        super().__init__(group_names, page_size)
+        self.get_group_calls = 0
+
+    # Follows boto3 signature
+    def get_group(self, GroupName):
+        """mock method raises exception for unknown groups"""
+        self.get_group_calls += 1
+        if GroupName not in self.group_names:
+            raise MockClientError("NoSuchEntity")
+
+
 class MockBoto3withException(MockBoto3):
     """Mock for Boto3 exception"""
 
@@ -51,6 +97,145 @@ class MockBoto3withException(MockBoto3):
         raise Exception
 
 
+class MockBoto3withGroupException(MockBoto3):
+    """Mock for Boto3 failing for a single group"""
+
+    def __init__(self, failing_group, member_groups=()):
+        self.failing_group = failing_group
+        self.member_groups = list(member_groups)
+        self.removed_groups = []
+
+    # Follows boto3 signature
+    def list_groups_for_user(self, UserName, Marker=None):
+        """mock method returns the groups the user was already a member of"""
+        return {
+            "Groups": [{"GroupName": group} for group in self.member_groups],
+            "IsTruncated": False,
+        }
+
+    def add_user_to_group(self, GroupName, UserName):
+        """mock method raises exception for the failing group"""
+        if GroupName == self.failing_group:
+            raise Exception
+
+    def remove_user_from_group(self, GroupName, UserName):
+        """mock method records removed group"""
+        self.removed_groups.append(GroupName)
+
+
+class MockBoto3withUserGroups(MockBoto3):
+    """Mock for boto3 with groups of a user"""
+
+    def __init__(self, group_names):
+        self.group_names = group_names
+        self.removed_groups = []
+
+    # Follows boto3 signature
+    def list_groups_for_user(self, UserName, Marker=None):
+        """mock method returns the groups of the user two at a time"""
+        start = int(Marker or 0)
+        return {
+            "Groups": [
+                {"GroupName": group_name}
+                for group_name in self.group_names[start:start + 2]
+            ],
+            "IsTruncated": start + 2 < len(self.group_names),
+            "Marker": str(start + 2),
+        }
+
+    def remove_user_from_group(self, GroupName, UserName):
+        """mock method records removed group"""
+        if GroupName == "protected":
+            raise Exception("AccessDenied")
+        self.removed_groups.append(GroupName)
+
+
+class MockClientError(Exception):
+    """Mock for botocore ClientError"""
+
+    def __init__(self, code, status=400):
+        super().__init__(code)
+        self.response = {
+            "Error": {"Code": code},
+            "ResponseMetadata": {"HTTPStatusCode": status},
+        }
+
+
+class MockBoto3withErrors(MockBoto3):
+    """Mock for boto3 failing the first calls with an error code"""
+
+    def __init__(self, failures, code):
+        self.failures = failures
+        self.code = code
+        self.calls = 0
+
+    # Follows boto3 signature
+    def add_user_to_group(self, GroupName, UserName):
+        """mock method raises the error for the first calls"""
+        self.calls += 1
+        if self.calls <= self.failures:
+            if isinstance(self.code, Exception):
+                raise self.code
+            raise MockClientError(self.code)
+
+
+class MockBoto3withGroupErrors(MockBoto3):
+    """Mock for boto3 failing to list groups and to get some groups"""
+
+    def __init__(self):
+        self.get_group_calls = 0
+
+    # Follows boto3 signature
+    def list_groups(self, Marker=None, MaxItems=None, PathPrefix="/"):
+        """mock method raises access denied"""
+        raise MockClientError("AccessDenied")
+
+    def get_group(self, GroupName):
+        """mock method raises an error for the missing and denied groups"""
+        self.get_group_calls += 1
+        if GroupName == "Missing":
+            raise MockClientError("NoSuchEntity")
+        if GroupName == "Denied":
+            raise MockClientError("AccessDenied")
+        return {"Group": {"GroupName": GroupName}}
+
+
+class MockBoto3withGroupMembers(MockBoto3):
+    """Mock for boto3 with paginated group members"""
+
+    def __init__(self, group_members):
+        self.group_members = group_members
+
+    # Follows boto3 signature
+    def get_group(self, GroupName, Marker=None):
+        """mock method returns a page of two group members"""
+        if GroupName not in self.group_members:
+            raise MockClientError("NoSuchEntity")
+        users = self.group_members[GroupName]
+        start = int(Marker or 0)
+        return {
+            "Group": {"GroupName": GroupName},
+            "Users": [{"UserName": user} for user in users[start:start + 2]],
+            "IsTruncated": start + 2 < len(users),
+            "Marker": str(start + 2),
+        }
+
+
+class MockBoto3withUser(MockBoto3withUserGroups):
+    """Mock for boto3 with an IAM user and its groups"""
+
+    def __init__(self, group_names, user_exists=True):
+        super().__init__(group_names)
+        self.user_exists = user_exists
+
+    # Follows boto3 signature
+    def get_user(self, UserName):
+        """mock method raises exception for unknown users"""
+        if not self.user_exists:
+            raise MockClientError("NoSuchEntity")
+        return {"User": {"UserName": UserName}}
+
+
 def test_get_aws_credentails(*args, **kwargs):
     """mock function raises exception"""
     value = helpers._get_aws_credentails("test")
@@ -152,6 +337,17 @@ def test_aws_access(mocker):
     mocker.patch(
             "Access.access_modules.aws_access.helpers.revoke_aws_access",
             return_value=(True, ""))
+    mocker.patch(
+            "Access.access_modules.aws_access.helpers._get_current_aws_groups",
+            return_value=set())
+    mocker.patch(
+            "Access.access_modules.aws_access.helpers.prefetch_aws_group_catalogs")
+    mocker.patch(
+            "Access.access_modules.aws_access.helpers.aws_account_exists",
+            return_value=True)
+    mocker.patch(
+            "Access.access_modules.aws_access.helpers.aws_groups_exist",
+            return_value={"test 1": True})
     aws_access = access.AWSAccess()
 
     label_1 = {
@@ -202,7 +398,35 @@ def test_aws_access(mocker):
 def test_get_aws_accounts():
     """unit test for get_aws_accounts"""
     accounts = helpers.get_aws_accounts()
-    assert isinstance(accounts, list)
+    assert isinstance(accounts, tuple)
+
+
+def test_aws_account_index(mocker):
+    """unit test for the aws account index"""
+    accounts = [
+        {"account": "Dev", "access_key_id": "dev-id", "secret_access_key": "dev-key"},
+        {"account": "Prod", "access_key_id": "prod-id", "secret_access_key": "prod-key"},
+    ]
+    mocker.patch.dict(
+        "Access.access_modules.aws_access.helpers.ACCESS_MODULES",
+        {"aws_access": {"aws_accounts": accounts}},
+    )
+
+    assert helpers.get_aws_accounts() == ("Dev", "Prod")
+    assert helpers.get_aws_accounts() is helpers.get_aws_accounts()
+    assert helpers.aws_account_exists("Prod")
+    assert not helpers.aws_account_exists("Staging")
+    assert helpers._get_aws_credentails("Prod") == {
+        "aws_access_key_id": "prod-id",
+        "aws_secret_access_key": "prod-key",
+    }
+
+    mocker.patch.dict(
+        "Access.access_modules.aws_access.helpers.ACCESS_MODULES",
+        {"aws_access": {"aws_accounts": accounts[:1]}},
+    )
+    assert helpers.get_aws_accounts() == ("Dev",)
+    assert not helpers.aws_account_exists("Prod")
 
 
 def test_get_aws_groups(mocker):
@@ -214,3 +438,725 @@ def test_get_aws_groups(mocker):
     group_data = helpers.get_aws_groups(account="test", marker=None)
     assert "Groups" in group_data
     assert len(group_data["Groups"]) == 2
+
+
+def test_get_aws_client_pool(mocker):
+    """unit test for aws client pooling"""
+    helpers.clear_aws_client_pool()
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.boto3.client",
+        side_effect=lambda *args, **kwargs: mocker.MagicMock(),
+    )
+    credentials = mocker.patch(
+        "Access.access_modules.aws_access.helpers._get_aws_credentails",
+        return_value={"aws_access_key_id": "id", "aws_secret_access_key": "key"},
+    )
+
+    client = helpers.get_aws_client("test", constants.IAM_RESOURCE)
+    assert helpers.get_aws_client("test", constants.IAM_RESOURCE) is client
+
+    credentials.return_value = {
+        "aws_access_key_id": "id",
+        "aws_secret_access_key": "rotated",
+    }
+    assert helpers.get_aws_client("test", constants.IAM_RESOURCE) is not client
+
+    stats = helpers.get_aws_client_pool_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["size"] == 1
+
+
+def test_grant_aws_access_batch(mocker):
+    """unit test for grant_aws_access_batch"""
+    user_mock = mocker.MagicMock()
+    user_mock.email = "test@example.com"
+    labels = [
+        {"action": constants.GROUP_ACCESS, "account": "test", "group": "group %s" % i}
+        for i in range(5)
+    ]
+
+    boto3_client = MockBoto3withGroupException(failing_group=None)
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.get_aws_client",
+        return_value=boto3_client,
+    )
+    granted, results = helpers.grant_aws_access_batch(user_mock, labels)
+    assert granted is True
+    assert [label for label, _, _ in results] == labels
+    assert boto3_client.removed_groups == []
+
+    boto3_client = MockBoto3withGroupException(failing_group="group 2")
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.get_aws_client",
+        return_value=boto3_client,
+    )
+    granted, results = helpers.grant_aws_access_batch(user_mock, labels)
+    assert granted is False
+    assert [result[1] for result in results] == [True, True, False, True, True]
+    assert sorted(boto3_client.removed_groups) == [
+        "group 0", "group 1", "group 3", "group 4"
+    ]
+
+    boto3_client = MockBoto3withGroupException(
+        failing_group="group 2", member_groups=["group 0", "group 4"]
+    )
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.get_aws_client",
+        return_value=boto3_client,
+    )
+    granted, results = helpers.grant_aws_access_batch(user_mock, labels)
+    assert granted is False
+    assert sorted(boto3_client.removed_groups) == ["group 1", "group 3"]
+
+
+def test_get_cached_aws_groups(mocker):
+    """unit test for get_cached_aws_groups"""
+    helpers.clear_aws_group_catalog()
+    group_names = ["Admin %s" % i for i in range(150)] + ["Dev %s" % i for i in range(10)]
+    boto3_client = MockBoto3withPages(group_names, page_size=40)
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.get_aws_client",
+        return_value=boto3_client,
+    )
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.aws_account_exists",
+        side_effect=lambda account: account == "test",
+    )
+
+    groups, marker = helpers.get_cached_aws_groups(account="test")
+    assert groups == group_names[:constants.DEFAULT_GROUP_PAGE_SIZE]
+    assert marker == str(constants.DEFAULT_GROUP_PAGE_SIZE)
+
+    groups, marker = helpers.get_cached_aws_groups(account="test", marker=marker)
+    assert groups == group_names[constants.DEFAULT_GROUP_PAGE_SIZE:]
+    assert marker is None
+
+    groups, marker = helpers.get_cached_aws_groups(
+        account="test", search="dev", match=constants.GROUP_SEARCH_PREFIX
+    )
+    assert groups == group_names[150:]
+    assert marker is None
+
+    groups, _ = helpers.get_cached_aws_groups(account="test", search="n 14")
+    assert groups == ["Admin 14"] + ["Admin 14%s" % i for i in range(10)]
+
+    assert boto3_client.calls == 4
+
+    assert helpers.get_cached_aws_groups(account="unknown") == ([], None)
+    with pytest.raises(Exception):
+        helpers._group_catalog.refresh("unknown")
+    assert boto3_client.calls == 4
+
+
+def test_aws_groups_exist(mocker):
+    """unit test for aws_group_exists and aws_groups_exist memoization"""
+    helpers.clear_aws_group_catalog()
+    group_names = ["Group %s" % i for i in range(20)]
+    boto3_client = MockBoto3withGetGroup(group_names, page_size=100)
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.get_aws_client",
+        return_value=boto3_client,
+    )
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.aws_account_exists",
+        side_effect=lambda account: account == "test",
+    )
+
+    assert helpers.aws_group_exists("test", "Group 1") is True
+    assert helpers.aws_group_exists("test", "Group 1") is True
+    assert helpers.aws_group_exists("test", "Missing") is False
+    assert helpers.aws_group_exists("test", "Missing") is False
+    assert boto3_client.get_group_calls == 2
+
+    groups = ["Group %s" % i for i in range(2, 12)] + ["Unknown"]
+    result = helpers.aws_groups_exist("test", groups)
+    assert result == dict({group: True for group in groups[:-1]}, Unknown=False)
+    assert boto3_client.calls == 1
+    assert boto3_client.get_group_calls == 3
+
+
+def test_aws_groups_exist_errors(mocker):
+    """unit test for aws_groups_exist when listing or getting groups fails"""
+    helpers.clear_aws_group_catalog()
+    boto3_client = MockBoto3withGroupErrors()
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.get_aws_client",
+        return_value=boto3_client,
+    )
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.aws_account_exists",
+        return_value=True,
+    )
+    groups = ["Group %s" % i for i in range(4)] + ["Missing", "Denied"]
+
+    result = helpers.aws_groups_exist("test", groups)
+    assert result == dict(
+        {group: True for group in groups[:4]}, Missing=False, Denied=False
+    )
+    assert boto3_client.get_group_calls == 6
+
+    assert helpers.aws_groups_exist("test", ["Missing", "Denied"]) == {
+        "Missing": False, "Denied": False
+    }
+    assert boto3_client.get_group_calls == 7
+
+
+def test_aws_validate_request(mocker):
+    """unit test for validate_request group checks"""
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.aws_account_exists",
+        return_value=True,
+    )
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.aws_groups_exist",
+        return_value={"test 1": True, "missing": False},
+    )
+    aws_access = access.AWSAccess()
+    label = {"action": constants.GROUP_ACCESS, "account": "test", "group": "missing"}
+    with pytest.raises(access.AWSModuleValidationError):
+        aws_access.validate_request([label], None)
+
+
+def test_offboard_aws_user(mocker):
+    """unit test for offboard_aws_user"""
+    user_mock = mocker.MagicMock()
+    user_mock.email = "test@example.com"
+    clients = {
+        "Dev": MockBoto3withUserGroups(["dev 1", "dev 2", "dev 3"]),
+        "Prod": MockBoto3withUserGroups(["prod 1", "protected"]),
+    }
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.get_aws_accounts",
+        return_value=("Dev", "Prod"),
+    )
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.get_aws_client",
+        side_effect=lambda account, resource: clients[account],
+    )
+
+    report = helpers.offboard_aws_user(user_mock)
+    assert report["user"] == "test"
+    assert report["success"] is False
+    assert report["accounts"]["Dev"]["removed"] == ["dev 1", "dev 2", "dev 3"]
+    assert report["accounts"]["Prod"]["removed"] == ["prod 1"]
+    assert list(report["accounts"]["Prod"]["failed"]) == ["protected"]
+    assert sorted(clients["Dev"].removed_groups) == ["dev 1", "dev 2", "dev 3"]
+
+
+@pytest.mark.parametrize(
+    """test_name, failures, error_code, expected_return_value, expected_calls""",
+    [
+        ("Throttled then granted", 2, "Throttling", True, 3),
+        ("Service unavailable then granted", 1, "ServiceUnavailable", True, 2),
+        ("Throttled beyond retries", 10, "Throttling", False,
+         constants.DEFAULT_MAX_RETRIES + 1),
+        ("Not retried", 1, "AccessDenied", False, 1),
+        ("Server error then granted", 1, MockClientError("InternalFailure", 500), True, 2),
+        ("Connection error then granted", 1,
+         EndpointConnectionError(endpoint_url="https://iam.amazonaws.com"), True, 2),
+        ("Read timeout then granted", 1,
+         ReadTimeoutError(endpoint_url="https://iam.amazonaws.com"), True, 2),
+    ],
+)
+def test_grant_aws_access_retry(
+    mocker, test_name, failures, error_code, expected_return_value, expected_calls
+):
+    """unit test for retrying throttled, server and connection errors"""
+    user_mock = mocker.MagicMock()
+    user_mock.email = "test@example.com"
+    boto3_client = MockBoto3withErrors(failures, error_code)
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.get_aws_client",
+        return_value=boto3_client,
+    )
+    mocker.patch("Access.access_modules.aws_access.helpers._get_rate_limiter")
+    sleep = mocker.patch("Access.access_modules.aws_access.helpers.time.sleep")
+
+    return_value, _ = helpers.grant_aws_access(user_mock, "test", "test")
+    assert return_value == expected_return_value
+    assert boto3_client.calls == expected_calls
+    assert sleep.call_count == expected_calls - 1
+
+
+def test_aws_rate_limiter(mocker):
+    """unit test for the aws rate limiter token bucket"""
+    now = mocker.patch(
+        "Access.access_modules.aws_access.helpers.time.monotonic", return_value=100.0
+    )
+    sleep = mocker.patch(
+        "Access.access_modules.aws_access.helpers.time.sleep",
+        side_effect=lambda seconds: setattr(now, "return_value", now.return_value + seconds),
+    )
+    limiter = helpers._TokenBucket(rate=2, capacity=3)
+    for _ in range(3):
+        limiter.acquire()
+    assert sleep.call_count == 0
+
+    limiter.acquire()
+    assert sleep.call_count == 1
+    assert sleep.call_args[0][0] == pytest.approx(0.5)
+
+
+def test_aws_approve_async_notification(mocker):
+    """unit test for approve with async notifications"""
+    user_mock = mocker.MagicMock()
+    user_mock.email = "test@example.com"
+    request_mock = mocker.MagicMock()
+    request_mock.request_id = "123"
+    label = {"action": constants.GROUP_ACCESS, "account": "test", "group": "test"}
+
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.grant_aws_access_batch",
+        return_value=(True, [(label, True, "")]),
+    )
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.async_notifications_enabled",
+        return_value=True,
+    )
+    dispatch = mocker.patch(
+        "Access.access_modules.aws_access.helpers.dispatch_notification"
+    )
+    send_email = mocker.patch(
+        "Access.access_modules.aws_access.access.AWSAccess._AWSAccess__send_approve_email",
+        side_effect=Exception("SMTP down"),
+    )
+
+    aws_access = access.AWSAccess()
+    assert aws_access.approve(user_mock, [label], None, request_mock) is True
+    assert dispatch.call_count == 1
+    assert send_email.call_count == 0
+
+
+def test_dispatch_notification(mocker):
+    """unit test for dispatch_notification retries"""
+    mocker.patch("Access.access_modules.aws_access.helpers.time.sleep")
+    send = mocker.MagicMock(side_effect=[Exception("SMTP down"), None])
+
+    future = helpers.dispatch_notification(send, "subject")
+    assert future.result(timeout=5) is True
+    assert send.call_count == 2
+    send.assert_called_with("subject")
+
+
+def test_reconcile_aws_group_memberships(mocker):
+    """unit test for reconcile_aws_group_memberships"""
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.get_aws_client",
+        return_value=MockBoto3withGroupMembers({
+            "admins": ["alice", "bob", "carol", "mallory"],
+            "devs": ["dave"],
+        }),
+    )
+    expected_memberships = [
+        ("alice", "admins"),
+        ("bob", "admins"),
+        ("carol", "admins"),
+        ("dave", "devs"),
+        ("erin", "devs"),
+        ("frank", "deleted"),
+    ]
+
+    report = helpers.reconcile_aws_group_memberships("test", expected_memberships)
+    assert report["extra"] == [("mallory", "admins")]
+    assert report["missing"] == [("erin", "devs")]
+    assert list(report["failed"]) == ["deleted"]
+
+
+def test_iter_aws_groups(mocker):
+    """unit test for iter_aws_groups"""
+    group_names = ["Group %s" % i for i in range(5)] + ["Ops %s" % i for i in range(5)]
+    boto3_client = MockBoto3withPages(group_names, page_size=3)
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.get_aws_client",
+        return_value=boto3_client,
+    )
+
+    groups = helpers.iter_aws_groups(account="test")
+    assert next(groups) == "Group 0"
+    assert boto3_client.calls == 1
+    assert list(groups) == group_names[1:]
+    assert boto3_client.calls == 4
+
+    assert list(helpers.iter_aws_groups(account="test", path_prefix="/Ops")) == (
+        group_names[5:]
+    )
+
+
+def test_get_aws_groups_unknown_account(mocker, rf):
+    """unit test for the aws groups view refusing unknown accounts"""
+    get_cached_aws_groups = mocker.patch(
+        "Access.access_modules.aws_access.helpers.get_cached_aws_groups"
+    )
+    for params in ({"AWSAccount": "unknown"}, {}):
+        request = rf.get("/api/v1/aws/account/groups/", params)
+        request.user = mocker.MagicMock()
+        assert views.get_aws_groups(request).status_code == 404
+    assert get_cached_aws_groups.call_count == 0
+
+
+def test_get_aws_groups_list_failure(mocker, rf):
+    """unit test for the aws groups view when the group catalog can't be loaded"""
+    helpers.clear_aws_group_catalog()
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.aws_account_exists",
+        return_value=True,
+    )
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.iter_aws_groups",
+        side_effect=MockClientError("AccessDenied"),
+    )
+    request = rf.get("/api/v1/aws/account/groups/", {"AWSAccount": "test"})
+    request.user = mocker.MagicMock()
+    response = views.get_aws_groups(request)
+    assert response.status_code == 500
+    assert json.loads(response.content) == {
+        "error": constants.ERROR_MESSAGES["list_groups_failed"]
+    }
+
+    # a refresh joining a failed one raises instead of returning no groups
+    catalog = helpers._AWSGroupCatalog()
+    event = catalog._loading["test"] = mocker.MagicMock()
+    with pytest.raises(Exception):
+        catalog.refresh("test")
+    event.wait.assert_called_once_with()
+
+
+def test_stream_aws_groups(mocker, rf):
+    """unit test for the streaming aws groups view"""
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.aws_account_exists",
+        return_value=True,
+    )
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.iter_aws_groups",
+        return_value=iter(["Group %s" % i for i in range(5)]),
+    )
+    request = rf.get(
+        "/api/v1/aws/account/groups/stream/", {"AWSAccount": "test", "page_size": "2"}
+    )
+    request.user = mocker.MagicMock()
+
+    response = views.stream_aws_groups(request)
+    chunks = [chunk.decode() for chunk in response.streaming_content]
+    assert len(chunks) == 5
+    assert json.loads("".join(chunks)) == {
+        "AWSGroups": ["Group %s" % i for i in range(5)]
+    }
+
+    request = rf.get(
+        "/api/v1/aws/account/groups/stream/", {"AWSAccount": "test", "page_size": "0"}
+    )
+    request.user = mocker.MagicMock()
+    assert views.stream_aws_groups(request).status_code == 400
+
+    for path_prefix in ("engineering", "/engineering", "/team a/"):
+        request = rf.get(
+            "/api/v1/aws/account/groups/stream/",
+            {"AWSAccount": "test", "path_prefix": path_prefix},
+        )
+        request.user = mocker.MagicMock()
+        assert views.stream_aws_groups(request).status_code == 400
+
+    iter_aws_groups = mocker.patch(
+        "Access.access_modules.aws_access.helpers.iter_aws_groups",
+        return_value=iter([]),
+    )
+    request = rf.get(
+        "/api/v1/aws/account/groups/stream/",
+        {"AWSAccount": "test", "path_prefix": "/engineering/"},
+    )
+    request.user = mocker.MagicMock()
+    assert views.stream_aws_groups(request).status_code == 200
+    assert iter_aws_groups.call_args.kwargs["path_prefix"] == "/engineering/"
+
+
+def _failing_groups(count):
+    """yields count groups and then fails like a throttled list_groups page"""
+    for i in range(count):
+        yield "Group %s" % i
+    raise MockClientError("Throttling")
+
+
+def test_stream_aws_groups_errors(mocker, rf):
+    """unit test for the streaming aws groups view when listing fails"""
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.aws_account_exists",
+        return_value=True,
+    )
+    request = rf.get(
+        "/api/v1/aws/account/groups/stream/", {"AWSAccount": "test", "page_size": "2"}
+    )
+    request.user = mocker.MagicMock()
+
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.iter_aws_groups",
+        return_value=_failing_groups(0),
+    )
+    response = views.stream_aws_groups(request)
+    assert response.status_code == 500
+    assert json.loads(response.content) == {
+        "error": constants.ERROR_MESSAGES["list_groups_failed"]
+    }
+
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.iter_aws_groups",
+        return_value=_failing_groups(3),
+    )
+    response = views.stream_aws_groups(request)
+    assert response.status_code == 200
+    assert json.loads(b"".join(response.streaming_content)) == {
+        "AWSGroups": ["Group 0", "Group 1", "Group 2"],
+        "error": constants.ERROR_MESSAGES["list_groups_failed"],
+    }
+
+
+def test_aws_assume_role_credentials(mocker):
+    """unit test for assume role credentials caching"""
+    helpers._assumed_role_credentials.clear()
+    mocker.patch.dict(
+        "Access.access_modules.aws_access.helpers.ACCESS_MODULES",
+        {
+            "aws_access": {
+                "aws_accounts": [
+                    {"account": "Prod", "role_arn": "arn:aws:iam::1:role/enigma"}
+                ]
+            }
+        },
+    )
+    expiration = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
+        hours=1
+    )
+    sts_client = mocker.MagicMock()
+    sts_client.assume_role.return_value = {
+        "Credentials": {
+            "AccessKeyId": "temp-id",
+            "SecretAccessKey": "temp-key",
+            "SessionToken": "token",
+            "Expiration": expiration,
+        }
+    }
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers._get_hub_sts_client",
+        return_value=sts_client,
+    )
+
+    expected_credentials = {
+        "aws_access_key_id": "temp-id",
+        "aws_secret_access_key": "temp-key",
+        "aws_session_token": "token",
+    }
+    assert helpers._get_aws_credentails("Prod") == expected_credentials
+    assert helpers._get_aws_credentails("Prod") == expected_credentials
+    assert helpers.aws_account_exists("Prod")
+    assert sts_client.assume_role.call_count == 1
+    assert sts_client.assume_role.call_args.kwargs["RoleArn"] == (
+        "arn:aws:iam::1:role/enigma"
+    )
+
+    sts_client.assume_role.return_value["Credentials"]["Expiration"] = (
+        expiration + datetime.timedelta(hours=1)
+    )
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.time.time",
+        return_value=expiration.timestamp() - 30,
+    )
+    assert helpers._get_aws_credentails("Prod") == expected_credentials
+    assert sts_client.assume_role.call_count == 2
+
+
+def test_aws_summarize_labels():
+    """unit test for summarize_labels"""
+    aws_access = access.AWSAccess()
+    labels = [
+        {"action": constants.GROUP_ACCESS, "account": "test", "group": "group %s" % i}
+        for i in range(500)
+    ]
+
+    label_desc, label_meta = aws_access.summarize_labels(labels)
+    assert label_desc == aws_access.combine_labels_desc(labels)
+    assert label_meta == aws_access.combine_labels_meta(labels)
+    assert label_meta["group"] == ", ".join("group %s" % i for i in range(500))
+    assert label_meta["account"] == ", ".join(["test"] * 500)
+    assert aws_access.summarize_labels([]) == ("", {})
+
+
+def test_plan_aws_grants(mocker):
+    """unit test for plan_aws_grants"""
+    user_mock = mocker.MagicMock()
+    user_mock.email = "test@example.com"
+    clients = {
+        "Dev": MockBoto3withUser(["dev 1", "dev 2"]),
+        "Prod": MockBoto3withUser([], user_exists=False),
+    }
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.get_aws_client",
+        side_effect=lambda account, resource: clients[account],
+    )
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.aws_groups_exist",
+        side_effect=lambda account, groups: {group: group != "missing" for group in groups},
+    )
+    labels = [
+        {"action": constants.GROUP_ACCESS, "account": account, "group": group}
+        for account, group in [
+            ("Dev", "dev 1"), ("Dev", "dev 3"), ("Dev", "missing"), ("Prod", "prod 1")
+        ]
+    ]
+
+    plan = helpers.plan_aws_grants(user_mock, labels)
+    assert plan["grant"] == [labels[1]]
+    assert plan["skip"] == [labels[0]]
+    assert [label for label, _ in plan["invalid"]] == [labels[2], labels[3]]
+
+
+def test_aws_approve_with_plan(mocker):
+    """unit test for approve skipping granted groups"""
+    user_mock = mocker.MagicMock()
+    user_mock.email = "test@example.com"
+    request_mock = mocker.MagicMock()
+    labels = [
+        {"action": constants.GROUP_ACCESS, "account": "test", "group": "test %s" % i}
+        for i in range(3)
+    ]
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.plan_grants_enabled",
+        return_value=True,
+    )
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.plan_aws_grants",
+        return_value={"grant": labels[2:], "skip": labels[:2], "invalid": []},
+    )
+    grant = mocker.patch(
+        "Access.access_modules.aws_access.helpers.grant_aws_access_batch",
+        return_value=(True, []),
+    )
+    mocker.patch(
+        "Access.access_modules.aws_access.access.AWSAccess._AWSAccess__send_approve_email"
+    )
+
+    aws_access = access.AWSAccess()
+    assert aws_access.approve(user_mock, labels, None, request_mock) is True
+    grant.assert_called_once_with(user_mock.user, labels[2:])
+
+
+def test_get_aws_client_settings(mocker):
+    """unit test for per account aws client settings"""
+    helpers.clear_aws_client_pool()
+    mocker.patch.dict(
+        "Access.access_modules.aws_access.helpers.ACCESS_MODULES",
+        {
+            "aws_access": {
+                "aws_accounts": [
+                    {
+                        "account": "Local",
+                        "access_key_id": "id",
+                        "secret_access_key": "key",
+                        "endpoint_url": "http://localhost:4566",
+                        "client_config": {"max_pool_connections": 50},
+                    },
+                    {"account": "Dev", "access_key_id": "id", "secret_access_key": "key"},
+                ],
+                "region_name": "us-east-1",
+                "client_config": {"connect_timeout": 5},
+            }
+        },
+    )
+    boto3_client = mocker.patch(
+        "Access.access_modules.aws_access.helpers.boto3.client",
+        side_effect=lambda *args, **kwargs: mocker.MagicMock(),
+    )
+
+    helpers.get_aws_client("Local", constants.IAM_RESOURCE)
+    kwargs = boto3_client.call_args.kwargs
+    assert kwargs["endpoint_url"] == "http://localhost:4566"
+    assert kwargs["region_name"] == "us-east-1"
+    assert kwargs["config"].max_pool_connections == 50
+    assert kwargs["config"].connect_timeout == 5
+
+    helpers.get_aws_client("Dev", constants.IAM_RESOURCE)
+    kwargs = boto3_client.call_args.kwargs
+    assert "endpoint_url" not in kwargs
+    assert kwargs["config"].max_pool_connections == constants.DEFAULT_MAX_POOL_CONNECTIONS
+
+    helpers.get_aws_client("Local", constants.IAM_RESOURCE)
+    assert boto3_client.call_count == 2
+
+
+def test_aws_group_catalog_snapshot(mocker, tmp_path):
+    """unit test for the aws group catalog snapshot"""
+    snapshot_path = str(tmp_path / "aws_groups.jsonl")
+    mocker.patch.dict(
+        "Access.access_modules.aws_access.helpers.ACCESS_MODULES",
+        {
+            "aws_access": {
+                "aws_accounts": [{"account": "test", "role_arn": "arn"}],
+                "group_catalog_snapshot_path": snapshot_path,
+            }
+        },
+    )
+    group_names = ["Group %s" % i for i in range(5)]
+    boto3_client = MockBoto3withPages(group_names, page_size=100)
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.get_aws_client",
+        return_value=boto3_client,
+    )
+
+    helpers._AWSGroupCatalog().refresh("test")
+    assert boto3_client.calls == 1
+    assert os.listdir(tmp_path) == ["aws_groups.jsonl"]
+
+    catalog = helpers._AWSGroupCatalog()
+    refresh_in_background = mocker.patch.object(catalog, "refresh_in_background")
+    assert catalog.get("test")[0] == tuple(group_names)
+    assert catalog.is_fresh("test")
+    assert boto3_client.calls == 1
+    assert refresh_in_background.call_count == 0
+
+    mocker.patch(
+        "Access.access_modules.aws_access.helpers.time.time",
+        return_value=time.time() + constants.DEFAULT_GROUP_CATALOG_TTL + 1,
+    )
+    catalog = helpers._AWSGroupCatalog()
+    refresh_in_background = mocker.patch.object(catalog, "refresh_in_background")
+    assert catalog.get("test")[0] == tuple(group_names)
+    refresh_in_background.assert_called_once_with("test")
+
+
+def test_aws_metrics_sink(mocker):
+    """unit test for aws api call instrumentation"""
+    user_mock = mocker.MagicMock()
+    user_mock.email = "test@example.com"
+    mocker.patch("Access.access_modules.aws_access.helpers._get_rate_limiter")
+    mocker.patch("Access.access_modules.aws_access.helpers.time.sleep")
+    callback = mocker.MagicMock()
+    sinks = [metrics.InMemoryMetricsSink(), metrics.CallbackMetricsSink(callback)]
+
+    for sink in sinks:
+        helpers.set_aws_metrics_sink(sink)
+        mocker.patch(
+            "Access.access_modules.aws_access.helpers.get_aws_client",
+            return_value=MockBoto3withErrors(1, "Throttling"),
+        )
+        helpers.grant_aws_access(user_mock, "test", "test")
+        mocker.patch(
+            "Access.access_modules.aws_access.helpers.get_aws_client",
+            return_value=MockBoto3withErrors(1, "AccessDenied"),
+        )
+        helpers.grant_aws_access(user_mock, "test", "test")
+    helpers.set_aws_metrics_sink(None)
+
+    snapshot = sinks[0].snapshot()
+    recorded = snapshot[("test", "add_user_to_group")]
+    assert recorded["calls"] == 2
+    assert recorded["errors"] == 1
+    assert recorded["retries"] == 1
+    assert sum(recorded["histogram"]) == 2
+
+    names = [call.args[1] for call in callback.call_args_list]
+    assert names.count("aws_access.iam.calls") == 2
+    assert names.count("aws_access.iam.errors") == 1
+    assert names.count("aws_access.iam.retries") == 1
+    assert callback.call_args_list[0].args[3] == {
+        "account": "test", "operation": "add_user_to_group"
+    }
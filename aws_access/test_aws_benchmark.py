@@ -0,0 +1,201 @@
+"""aws access module benchmarks against a stubbed IAM endpoint
+
+The IAM latency and the number of iterations can be changed with the
+AWS_BENCHMARK_LATENCY_MS and AWS_BENCHMARK_ITERATIONS environment variables,
+with at least 2 iterations. Latency percentiles are recorded as test
+properties, for example in the --junitxml report.
+"""
+import collections
+import os
+import statistics
+import threading
+import time
+
+import pytest
+
+from . import constants, helpers, access, views
+
+LATENCY = int(os.environ.get("AWS_BENCHMARK_LATENCY_MS", "5")) / 1000
+# percentiles need at least two samples
+ITERATIONS = max(2, int(os.environ.get("AWS_BENCHMARK_ITERATIONS", "20")))
+ACCOUNT = "Benchmark"
+GROUPS = ["Group %s" % i for i in range(250)]
+
+
+class StubIAM:
+    """Stub for the boto3 IAM client with a fixed latency per call"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = collections.Counter()
+        self._lock = threading.Lock()
+
+    def _call(self, operation):
+        with self._lock:
+            self.calls[operation] += 1
+        time.sleep(self.latency)
+
+    # Follows boto3 signature
+    def get_group(self, GroupName, Marker=None):
+        """stub method"""
+        self._call("get_group")
+        return {"Group": {"GroupName": GroupName}, "Users": [], "IsTruncated": False}
+
+    def list_groups_for_user(self, UserName, Marker=None):
+        """stub method"""
+        self._call("list_groups_for_user")
+        return {"Groups": [], "IsTruncated": False}
+
+    def add_user_to_group(self, GroupName, UserName):
+        """stub method"""
+        self._call("add_user_to_group")
+
+    def remove_user_from_group(self, GroupName, UserName):
+        """stub method"""
+        self._call("remove_user_from_group")
+
+    def list_groups(self, Marker=None, MaxItems=100):
+        """stub method returns a page of groups"""
+        self._call("list_groups")
+        start = int(Marker or 0)
+        end = start + MaxItems
+        return {
+            "Groups": [{"GroupName": group} for group in GROUPS[start:end]],
+            "IsTruncated": end < len(GROUPS),
+            "Marker": str(end),
+        }
+
+
+@pytest.fixture
+def stub_iam(mocker):
+    """Configures a benchmark account backed by the IAM stub"""
+    mocker.patch.dict(
+        "Access.access_modules.aws_access.helpers.ACCESS_MODULES",
+        {
+            "aws_access": {
+                "aws_accounts": [
+                    {
+                        "account": ACCOUNT,
+                        "access_key_id": "id",
+                        "secret_access_key": "key",
+                    }
+                ],
+                "rate_limit": 100000,
+                "rate_limit_burst": 100000,
+            }
+        },
+    )
+    helpers.clear_aws_client_pool()
+    helpers.clear_aws_group_catalog()
+    stub = StubIAM(LATENCY)
+    boto3_client = mocker.patch(
+        "Access.access_modules.aws_access.helpers.boto3.client", return_value=stub
+    )
+    mocker.patch(
+        "Access.access_modules.aws_access.access.AWSAccess.email_via_smtp",
+        return_value="",
+    )
+    mocker.patch(
+        "Access.access_modules.aws_access.access.AWSAccess._generate_string_from_template",
+        return_value="",
+    )
+    stub.boto3_client = boto3_client
+    yield stub
+    helpers.clear_aws_client_pool()
+    helpers.clear_aws_group_catalog()
+
+
+def _benchmark(record_property, name, stub, func):
+    """Runs func ITERATIONS times and records latency and calls per request."""
+    durations = []
+    stub.calls.clear()
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+
+    percentiles = statistics.quantiles(durations, n=100, method="inclusive")
+    calls_per_request = sum(stub.calls.values()) / ITERATIONS
+    record_property(name + "_p50_ms", round(percentiles[49] * 1000, 3))
+    record_property(name + "_p99_ms", round(percentiles[98] * 1000, 3))
+    record_property(name + "_calls_per_request", calls_per_request)
+    return calls_per_request
+
+
+def _labels(count):
+    return [
+        {"action": constants.GROUP_ACCESS, "account": ACCOUNT, "group": group}
+        for group in GROUPS[:count]
+    ]
+
+
+def test_benchmark_validate_request(record_property, stub_iam):
+    """benchmark validate_request for 20 labels"""
+    aws_access = access.AWSAccess()
+    labels = _labels(20)
+    calls = _benchmark(
+        record_property,
+        "validate_request",
+        stub_iam,
+        lambda: aws_access.validate_request(labels, None),
+    )
+    assert calls <= 1 / ITERATIONS
+    assert stub_iam.boto3_client.call_count == 1
+
+
+def test_benchmark_approve(mocker, record_property, stub_iam):
+    """benchmark approve for 10 labels
+
+    The user's groups are listed before the parallel grants so a failed
+    batch only rolls back groups it added, which makes an approval two
+    sequential round trips.
+    """
+    aws_access = access.AWSAccess()
+    user_identity = mocker.MagicMock()
+    user_identity.user.email = "test@example.com"
+    request = mocker.MagicMock()
+    request.request_id = "123"
+    labels = _labels(10)
+
+    calls = _benchmark(
+        record_property,
+        "approve",
+        stub_iam,
+        lambda: aws_access.approve(user_identity, labels, None, request),
+    )
+    assert calls == len(labels) + 1
+    assert stub_iam.boto3_client.call_count == 1
+
+
+def test_benchmark_revoke(mocker, record_property, stub_iam):
+    """benchmark revoke for a single label"""
+    aws_access = access.AWSAccess()
+    user = mocker.MagicMock()
+    user.email = "test@example.com"
+    request = mocker.MagicMock()
+    request.request_id = "123"
+    label = _labels(1)[0]
+
+    calls = _benchmark(
+        record_property,
+        "revoke",
+        stub_iam,
+        lambda: aws_access.revoke(user, mocker.MagicMock(), label, request),
+    )
+    assert calls == 1
+    assert stub_iam.boto3_client.call_count == 1
+
+
+def test_benchmark_groups_view(mocker, record_property, rf, stub_iam):
+    """benchmark the aws groups view"""
+    request = rf.get("/api/v1/aws/account/groups/", {"AWSAccount": ACCOUNT})
+    request.user = mocker.MagicMock()
+
+    calls = _benchmark(
+        record_property,
+        "groups_view",
+        stub_iam,
+        lambda: views.get_aws_groups(request),
+    )
+    assert calls <= 1 / ITERATIONS
+    assert stub_iam.boto3_client.call_count == 1
@@ -5,4 +5,5 @@ from . import views
 urlpatterns = [
     re_path(r"^api/v1/aws/accounts/$", views.get_aws_accounts),
     re_path(r"^api/v1/aws/account/groups/$", views.get_aws_groups),
+    re_path(r"^api/v1/aws/account/groups/stream/$", views.stream_aws_groups),
 ]
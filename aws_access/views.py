@@ -1,10 +1,20 @@
 """aws module views"""
+import itertools
 import json
+import logging
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponseNotFound
+from django.http import (
+    HttpResponseBadRequest,
+    HttpResponseNotFound,
+    HttpResponseServerError,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from . import constants
 from . import helpers
 
+logger = logging.getLogger(__name__)
+
 
 @login_required
 def get_aws_accounts(request):
@@ -31,20 +41,127 @@ def get_aws_groups(request):
         JsonResponse: json response with aws groups list
     """
     data = request.GET
-    if "AWSAccount" not in data and not helpers.aws_account_exists(data["AWSAccount"]):
+    if not data.get("AWSAccount") or not helpers.aws_account_exists(data["AWSAccount"]):
         response = {"error": constants.ERROR_MESSAGES["valid_account_required"]}
         return HttpResponseNotFound(json.dumps(response))
     account = data["AWSAccount"]
     marker = None
     if data.get(
         "marker"
-    ):  # marker to the page to be fetched if AWS response is paginated
+    ):  # marker to the page to be fetched if the group list is paginated
         marker = data["marker"]
-    aws_groups_data = helpers.get_aws_groups(account=account, marker=marker)
-    data = []
-    for group in aws_groups_data["Groups"]:
-        data.append(group["GroupName"])
-    response = {"AWSGroups": data, "marker": None}
-    if aws_groups_data.get("IsTruncated"):
-        response["marker"] = aws_groups_data["Marker"]
+    page_size = _get_page_size(data)
+    if page_size is False:
+        response = {"error": constants.ERROR_MESSAGES["valid_page_size_required"]}
+        return HttpResponseBadRequest(json.dumps(response))
+    try:
+        groups, marker = helpers.get_cached_aws_groups(
+            account=account,
+            marker=marker,
+            search=data.get("search"),
+            match=data.get("match"),
+            page_size=page_size,
+        )
+    except Exception as ex:
+        logger.error("Could not list AWS groups of %s: %s", account, str(ex))
+        response = {"error": constants.ERROR_MESSAGES["list_groups_failed"]}
+        return HttpResponseServerError(json.dumps(response))
+    response = {"AWSGroups": groups, "marker": marker}
     return JsonResponse(response)
+
+
+@login_required
+def stream_aws_groups(request):
+    """streams all aws groups of an account as a chunked json response
+
+    Args:
+        request (HttpRequest): http request form for aws groups
+
+    Returns:
+        StreamingHttpResponse: json response with aws groups list
+    """
+    data = request.GET
+    if not data.get("AWSAccount") or not helpers.aws_account_exists(data["AWSAccount"]):
+        response = {"error": constants.ERROR_MESSAGES["valid_account_required"]}
+        return HttpResponseNotFound(json.dumps(response))
+    page_size = _get_page_size(data)
+    if page_size is False:
+        response = {"error": constants.ERROR_MESSAGES["valid_page_size_required"]}
+        return HttpResponseBadRequest(json.dumps(response))
+    page_size = page_size or constants.DEFAULT_GROUP_PAGE_SIZE
+    path_prefix = _get_path_prefix(data)
+    if path_prefix is False:
+        response = {"error": constants.ERROR_MESSAGES["valid_path_prefix_required"]}
+        return HttpResponseBadRequest(json.dumps(response))
+    groups = helpers.iter_aws_groups(
+        account=data["AWSAccount"],
+        path_prefix=path_prefix,
+        page_size=page_size,
+    )
+    # the first page is fetched before the response starts, so an account
+    # that can't be listed gets an error response instead of a broken document
+    try:
+        first_groups = list(itertools.islice(groups, 1))
+    except Exception as ex:
+        logger.error("Could not list AWS groups of %s: %s", data["AWSAccount"], str(ex))
+        response = {"error": constants.ERROR_MESSAGES["list_groups_failed"]}
+        return HttpResponseServerError(json.dumps(response))
+    groups = itertools.chain(first_groups, groups)
+    return StreamingHttpResponse(
+        _stream_groups_json(groups, page_size), content_type="application/json"
+    )
+
+
+def _get_page_size(data):
+    """returns the requested page size, None if not given and False if invalid"""
+    if not data.get("page_size"):
+        return None
+    page_size = data["page_size"]
+    if not page_size.isdigit() or not (
+        0 < int(page_size) <= constants.MAX_LIST_GROUPS_PAGE_SIZE
+    ):
+        return False
+    return int(page_size)
+
+
+def _get_path_prefix(data):
+    """returns the requested IAM path prefix, None if not given and False if invalid"""
+    if not data.get("path_prefix"):
+        return None
+    path_prefix = data["path_prefix"]
+    if not (
+        len(path_prefix) <= constants.MAX_PATH_PREFIX_LENGTH
+        and path_prefix.startswith("/")
+        and path_prefix.endswith("/")
+        and all("\u0021" <= char <= "\u007f" for char in path_prefix)
+    ):
+        return False
+    return path_prefix
+
+
+def _stream_groups_json(groups, chunk_size):
+    """yields the aws groups json document in chunks of chunk_size groups
+
+    If a page of groups can't be fetched the document is still closed, with
+    an error field telling that the group list is incomplete.
+    """
+    yield '{"AWSGroups": ['
+    separator = ""
+    chunk = []
+    error = None
+    try:
+        for group in groups:
+            chunk.append(json.dumps(group))
+            if len(chunk) == chunk_size:
+                yield separator + ", ".join(chunk)
+                separator = ", "
+                chunk = []
+    except Exception as ex:
+        logger.error("Could not list AWS groups: %s", str(ex))
+        error = constants.ERROR_MESSAGES["list_groups_failed"]
+    if chunk:
+        yield separator + ", ".join(chunk)
+    if error is None:
+        yield "]}"
+    else:
+        yield '], "error": %s}' % json.dumps(error)
@@ -137,15 +137,27 @@ class GCPAccess(BaseEmailAccess):
         """
         user = user_identity.user
         label_desc = self.combine_labels_desc(labels)
+        domain_labels = {}
         for label in labels:
-            result, exception = helpers.grant_gcp_access(
-                label["group"], label["domain"], user.email
+            domain_labels.setdefault(label["domain"], []).append(label)
+
+        for domain_id, domain_label_list in domain_labels.items():
+            results = helpers.batch_gcp_membership_changes(
+                domain_id,
+                [
+                    (constants.INSERT_MEMBER, label["group"], user.email)
+                    for label in domain_label_list
+                ],
             )
-            if result is False:
-                logger.error(
-                    "Something went wrong while adding the %s to group %s: %s",
-                    user.email, label["group"], str(exception)
-                )
+            is_granted = True
+            for label, (result, exception) in zip(domain_label_list, results):
+                if result is False:
+                    logger.error(
+                        "Something went wrong while adding the %s to group %s: %s",
+                        user.email, label["group"], str(exception)
+                    )
+                    is_granted = False
+            if not is_granted:
                 return False
 
         try:
@@ -231,6 +243,7 @@ class GCPAccess(BaseEmailAccess):
         Returns:
             dict: Dictionary of GCP accounts.
         """
+        helpers.prefetch_gcp_group_indexes()
         return {"domains": helpers.get_gcp_domains()}
 
     def access_desc(self):
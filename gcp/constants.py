@@ -3,3 +3,26 @@ GCP_ACCESS_TAG = "gcp_access"
 VALID_ACTION_REQUIRED_ERROR = "Valid action is required for the request."
 VALID_DOMAIN_REQUIRED_ERROR = "Valid domain is require for the request."
 VALID_GROUP_REQUIRED_ERROR = "Valid group is required for the request."
+DIRECTORY_GROUP_SCOPES = ["https://www.googleapis.com/auth/admin.directory.group"]
+INSERT_MEMBER = "insert"
+DELETE_MEMBER = "delete"
+BATCH_SIZE = 1000
+BATCH_MAX_RETRIES = 3
+BATCH_RETRY_DELAY = 1
+TRANSIENT_STATUS_CODES = (429, 500, 502, 503, 504)
+MAX_GROUPS_PAGE_SIZE = 200
+DEFAULT_GROUP_INDEX_TTL = 300
+GROUP_SEARCH_PREFIX = "prefix"
+MAX_MEMBERS_PAGE_SIZE = 200
+DEFAULT_MEMBERSHIP_CACHE_TTL = 300
+DEFAULT_MAX_PARALLEL_DOMAINS = 10
+DEFAULT_RATE_LIMIT = 20
+DEFAULT_RATE_LIMIT_BURST = 40
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_RETRY_BASE_DELAY = 1
+DEFAULT_RETRY_MAX_DELAY = 16
+RATE_LIMIT_ERROR_REASONS = {
+    "rateLimitExceeded",
+    "userRateLimitExceeded",
+    "RATE_LIMIT_EXCEEDED",
+}
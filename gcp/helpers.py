@@ -1,4 +1,12 @@
+import bisect
+import collections
+import json
 import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from googleapiclient.discovery import build
 from google.oauth2 import service_account
@@ -8,6 +16,213 @@ from . import constants
 
 logger = logging.getLogger(__name__)
 
+_credentials_cache = {}
+_credentials_lock = threading.Lock()
+_service_account_info_cache = {}
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+_GCPDomainIndex = collections.namedtuple("_GCPDomainIndex", ["source", "domains", "ids"])
+_domain_index = None
+_domain_index_lock = threading.Lock()
+_thread_local = threading.local()
+
+
+class _GCPGroupIndex:
+    """In memory index of the groups of each GCP domain.
+
+    A domain's groups are loaded by paging through groups().list once and
+    kept sorted by email. Entries older than the configured TTL are still
+    served while a background refresh replaces them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._loading = {}
+
+    def get(self, domain_id):
+        """Returns the index entry of the domain, loading it on first use."""
+        entry = self._entries.get(domain_id)
+        if entry is None:
+            return self.refresh(domain_id)
+        if self._is_stale(entry):
+            self.refresh_in_background(domain_id)
+        return entry
+
+    def is_fresh(self, domain_id):
+        """Returns True if the domain groups are loaded and within the TTL."""
+        entry = self._entries.get(domain_id)
+        return entry is not None and not self._is_stale(entry)
+
+    def refresh(self, domain_id):
+        """Loads the domain groups, joining a refresh that is already running."""
+        with self._lock:
+            event = self._loading.get(domain_id)
+            is_owner = event is None
+            if is_owner:
+                event = self._loading[domain_id] = threading.Event()
+
+        if not is_owner:
+            event.wait()
+            entry = self._entries.get(domain_id)
+            if entry is None:
+                raise Exception("Could not load the GCP groups of " + domain_id)
+            return entry
+
+        try:
+            groups = sorted(
+                (
+                    {
+                        "email": group["email"],
+                        "name": group.get("name", ""),
+                        "id": group.get("id", ""),
+                    }
+                    for group in iter_gcp_groups(domain_id)
+                ),
+                key=lambda group: group["email"].lower(),
+            )
+            entry = _GCPGroupIndexEntry(
+                loaded_at=time.time(),
+                groups=tuple(groups),
+                emails=tuple(group["email"].lower() for group in groups),
+                search_keys=tuple(
+                    (group["email"] + " " + group["name"]).lower() for group in groups
+                ),
+            )
+            with self._lock:
+                self._entries[domain_id] = entry
+            return entry
+        finally:
+            with self._lock:
+                del self._loading[domain_id]
+            event.set()
+
+    def refresh_in_background(self, domain_id):
+        """Starts a background refresh unless one is already running."""
+        with self._lock:
+            if domain_id in self._loading:
+                return
+        threading.Thread(
+            target=self._refresh_quietly, args=(domain_id,), daemon=True
+        ).start()
+
+    def clear(self):
+        """Drops all index entries."""
+        with self._lock:
+            self._entries = {}
+
+    def _refresh_quietly(self, domain_id):
+        try:
+            self.refresh(domain_id)
+        except Exception as e:
+            logger.error("Could not refresh GCP groups for %s: %s", domain_id, str(e))
+
+    def _is_stale(self, entry):
+        ttl = _get_gcp_config().get(
+            "group_index_ttl", constants.DEFAULT_GROUP_INDEX_TTL
+        )
+        return time.time() - entry.loaded_at > ttl
+
+
+class _TokenBucket:
+    """Token bucket limiting the rate of GCP API calls."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Takes tokens, waiting until they are available.
+
+        Requests for more tokens than the bucket holds wait for a full
+        bucket and leave it in debt, which later calls wait out.
+        """
+        needed = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= needed:
+                    self._tokens -= tokens
+                    return
+                wait = (needed - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def fill(self):
+        """Returns the number of tokens currently in the bucket."""
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+
+class _GCPMembershipCache:
+    """TTL cache of the member emails of GCP groups keyed by (domain, group).
+
+    A group's members are loaded by paging through members().list once and
+    are kept up to date with the membership changes made by this module.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, domain_id, group_id):
+        """Returns the lowercased member emails of the group."""
+        entry = self._entries.get((domain_id, group_id))
+        ttl = _get_gcp_config().get(
+            "membership_cache_ttl", constants.DEFAULT_MEMBERSHIP_CACHE_TTL
+        )
+        if entry is None or time.time() - entry[0] > ttl:
+            members = {
+                member["email"].lower()
+                for member in iter_gcp_group_members(domain_id, group_id)
+                if member.get("email")
+            }
+            entry = (time.time(), members)
+            with self._lock:
+                self._entries[(domain_id, group_id)] = entry
+        return entry[1]
+
+    def update(self, domain_id, group_id, user_email, is_member):
+        """Records a membership change made by this module."""
+        with self._lock:
+            entry = self._entries.get((domain_id, group_id))
+            if entry is None:
+                return
+            if is_member:
+                entry[1].add(user_email.lower())
+            else:
+                entry[1].discard(user_email.lower())
+
+    def clear(self):
+        """Drops all cached memberships."""
+        with self._lock:
+            self._entries = {}
+
+
+_membership_cache = _GCPMembershipCache()
+
+_GCPGroupIndexEntry = collections.namedtuple(
+    "_GCPGroupIndexEntry", ["loaded_at", "groups", "emails", "search_keys"]
+)
+_group_index = _GCPGroupIndex()
+
+
+def _get_gcp_config():
+    """Gets GCP config."""
+    return ACCESS_MODULES[constants.GCP_ACCESS_TAG]
+
 
 def get_gcp_domain_details(domain_id):
     """Gets the GCP domains details.
@@ -18,30 +233,105 @@ def get_gcp_domain_details(domain_id):
     Returns:
         dict: GCP Domain.
     """
-    for domain in ACCESS_MODULES[constants.GCP_ACCESS_TAG]["domains"]:
-        if domain["domain_id"] == domain_id:
-            return domain
+    return _get_gcp_domain_index().domains.get(domain_id, {})
+
 
-    return {}
+def _get_gcp_domain_index():
+    """Gets the GCP domain index.
+
+    The index is built once from the configured domains and rebuilt only
+    when the config object is replaced.
+    """
+    global _domain_index
+    domains = _get_gcp_config()["domains"]
+    index = _domain_index
+    if index is not None and index.source is domains:
+        return index
+    with _domain_index_lock:
+        if _domain_index is None or _domain_index.source is not domains:
+            domain_map = {}
+            for domain in domains:
+                domain_map.setdefault(domain["domain_id"], domain)
+            _domain_index = _GCPDomainIndex(
+                source=domains,
+                domains=domain_map,
+                ids=tuple(domain["domain_id"] for domain in domains),
+            )
+        return _domain_index
 
 
 def get_gcp_client(domain_id):
     """Gets GCP client for api access.
 
+    Credentials are shared per domain and refresh their access token when
+    it expires. The service object is built once per domain and thread from
+    the discovery document bundled with the client library, since its http
+    transport must not be shared between threads.
+
     Args:
         domain_id (str): GCP Domain ID.
 
     Returns:
         client: GCP Session client.
     """
-    domain = get_gcp_domain_details(domain_id)
-    SCOPES = ["https://www.googleapis.com/auth/admin.directory.group"]
-
-    credentials = service_account.Credentials.from_service_account_file(
-        domain["service_account_path"], scopes=SCOPES, subject=domain["admin_id"]
+    credentials = _get_gcp_credentials(get_gcp_domain_details(domain_id))
+
+    clients = getattr(_thread_local, "clients", None)
+    if clients is None:
+        clients = _thread_local.clients = {}
+    cached = clients.get(domain_id)
+    if cached is not None and cached[0] is credentials:
+        return cached[1]
+
+    client = build(
+        "admin",
+        "directory_v1",
+        credentials=credentials,
+        cache_discovery=False,
+        static_discovery=True,
     )
+    clients[domain_id] = (credentials, client)
+    return client
+
+
+def _get_gcp_credentials(domain):
+    """Gets the cached service account credentials of a GCP domain.
 
-    return build("admin", "directory_v1", credentials=credentials)
+    Credentials are created again when the service account file changes.
+    """
+    modified_at, info = _load_service_account_info(domain["service_account_path"])
+    key = (domain["service_account_path"], domain["admin_id"])
+    cached = _credentials_cache.get(key)
+    if cached is None or cached[0] != modified_at:
+        with _credentials_lock:
+            cached = _credentials_cache.get(key)
+            if cached is None or cached[0] != modified_at:
+                credentials = service_account.Credentials.from_service_account_info(
+                    info,
+                    scopes=constants.DIRECTORY_GROUP_SCOPES,
+                    subject=domain["admin_id"],
+                )
+                cached = _credentials_cache[key] = (modified_at, credentials)
+    return cached[1]
+
+
+def _load_service_account_info(path):
+    """Reads a service account file, parsing it again only when it is modified."""
+    modified_at = os.stat(path).st_mtime_ns
+    cached = _service_account_info_cache.get(path)
+    if cached is None or cached[0] != modified_at:
+        with open(path) as service_account_file:
+            cached = (modified_at, json.load(service_account_file))
+        _service_account_info_cache[path] = cached
+    return cached
+
+
+def clear_gcp_client_cache():
+    """Drops the cached GCP credentials and the calling thread's clients."""
+    with _credentials_lock:
+        _credentials_cache.clear()
+        _service_account_info_cache.clear()
+    _thread_local.clients = {}
 
 
 def grant_gcp_access(group_id, domain_id, user_email):
@@ -55,16 +345,24 @@ def grant_gcp_access(group_id, domain_id, user_email):
     Returns:
         bool: True if access grant succeeds. False if access grant fails.
     """
+    if _is_membership_satisfied(
+        domain_id, constants.INSERT_MEMBER, group_id, user_email
+    ):
+        return (True, "")
     try:
         client = get_gcp_client(domain_id)
-        client.members().insert(
-            groupKey=group_id,
-            body={
-                "kind": "admin#directory#member",
-                "email": user_email,
-                "role": "MEMBER",
-            },
-        ).execute()
+        _execute(
+            domain_id,
+            client.members().insert(
+                groupKey=group_id,
+                body={
+                    "kind": "admin#directory#member",
+                    "email": user_email,
+                    "role": "MEMBER",
+                },
+            ),
+        )
+        _membership_cache.update(domain_id, group_id, user_email, True)
         return (True, "")
     except Exception as e:
         logger.exception("Exception while adding user to a GCP group: " + str(e))
@@ -84,9 +382,16 @@ def revoke_gcp_access(group_id, domain_id, user_email):
     Returns:
         bool: True if the revoke succeeds. False if the revoke fails
     """
+    if _is_membership_satisfied(
+        domain_id, constants.DELETE_MEMBER, group_id, user_email
+    ):
+        return (True, "")
     try:
         client = get_gcp_client(domain_id)
-        client.members().delete(groupKey=group_id, memberKey=user_email).execute()
+        _execute(
+            domain_id, client.members().delete(groupKey=group_id, memberKey=user_email)
+        )
+        _membership_cache.update(domain_id, group_id, user_email, False)
 
         return (True, "")
     except Exception as e:
@@ -94,6 +399,264 @@ def revoke_gcp_access(group_id, domain_id, user_email):
         return (False, str(e))
 
 
+def batch_gcp_membership_changes(domain_id, operations, skip_precheck=False):
+    """Make batched GCP API calls to add users to or remove users from groups.
+
+    Operations are sent in batches of up to 1000 requests. Sub requests that
+    fail with a transient error are retried in a new batch, the others are
+    not sent again.
+
+    Args:
+        domain_id (str): Domain ID of the GCP domain.
+        operations (list): (action, group_id, user_email) tuples, where action
+                           is constants.INSERT_MEMBER or constants.DELETE_MEMBER.
+        skip_precheck (bool, optional): Send every operation without checking
+            the group members first, for callers that already know the
+            current memberships. Defaults to False.
+
+    Returns:
+        list: (result, exception) of every operation, in operation order.
+    """
+    results = [(False, "")] * len(operations)
+    try:
+        client = get_gcp_client(domain_id)
+    except Exception as e:
+        logger.exception("Exception while creating the GCP client: " + str(e))
+        return [(False, str(e))] * len(operations)
+
+    pending = []
+    for index, operation in enumerate(operations):
+        if not skip_precheck and _is_membership_satisfied(domain_id, *operation):
+            results[index] = (True, "")
+        else:
+            pending.append(index)
+
+    for attempt in range(constants.BATCH_MAX_RETRIES + 1):
+        retry = []
+
+        def callback(request_id, response, exception):
+            index = int(request_id)
+            if exception is None:
+                results[index] = (True, "")
+                action, group_id, user_email = operations[index]
+                _membership_cache.update(
+                    domain_id, group_id, user_email, action == constants.INSERT_MEMBER
+                )
+            elif operations[index][0] == constants.INSERT_MEMBER and _is_member_exists(
+                exception
+            ):
+                results[index] = (True, "")
+            else:
+                results[index] = (False, str(exception))
+                if _is_transient_error(exception):
+                    retry.append(index)
+
+        for start in range(0, len(pending), constants.BATCH_SIZE):
+            chunk = pending[start:start + constants.BATCH_SIZE]
+            batch = client.new_batch_http_request()
+            for index in chunk:
+                batch.add(
+                    _membership_request(client, *operations[index]),
+                    callback=callback,
+                    request_id=str(index),
+                )
+            try:
+                _get_rate_limiter(domain_id).acquire(len(chunk))
+                batch.execute()
+            except Exception as e:
+                logger.exception("Exception while executing GCP batch: " + str(e))
+                for index in chunk:
+                    results[index] = (False, str(e))
+                if _is_transient_error(e):
+                    retry.extend(chunk)
+
+        if not retry or attempt == constants.BATCH_MAX_RETRIES:
+            break
+        pending = sorted(set(retry))
+        time.sleep(constants.BATCH_RETRY_DELAY * 2 ** attempt)
+
+    for (action, group_id, user_email), (result, exception) in zip(operations, results):
+        if not result:
+            logger.error(
+                "Exception while changing %s membership of %s in GCP group %s: %s",
+                action, user_email, group_id, exception
+            )
+    return results
+
+
+def _is_membership_satisfied(domain_id, action, group_id, user_email):
+    """Checks if a membership change can be skipped as already in place.
+
+    Only used when idempotent_grants is enabled. When verify_membership is
+    enabled, a skip suggested by the cache is confirmed with members().get,
+    which like the cache only sees direct members of the group.
+    """
+    config = _get_gcp_config()
+    if not config.get("idempotent_grants", False):
+        return False
+    is_insert = action == constants.INSERT_MEMBER
+    try:
+        is_member = user_email.lower() in _membership_cache.get(domain_id, group_id)
+        if is_member != is_insert:
+            return False
+        if config.get("verify_membership", False):
+            return _is_direct_member(domain_id, group_id, user_email) == is_insert
+    except Exception as e:
+        logger.error(
+            "Could not check membership of %s in GCP group %s: %s",
+            user_email, group_id, str(e)
+        )
+        return False
+    return True
+
+
+def _is_direct_member(domain_id, group_id, user_email):
+    """Checks if a user is a direct member of a GCP group."""
+    try:
+        _execute(
+            domain_id,
+            get_gcp_client(domain_id)
+            .members()
+            .get(groupKey=group_id, memberKey=user_email),
+        )
+    except Exception as e:
+        if _get_status_code(e) == 404:
+            return False
+        raise
+    return True
+
+
+def _membership_request(client, action, group_id, user_email):
+    """Builds the GCP API request of a membership change."""
+    if action == constants.INSERT_MEMBER:
+        return client.members().insert(
+            groupKey=group_id,
+            body={
+                "kind": "admin#directory#member",
+                "email": user_email,
+                "role": "MEMBER",
+            },
+        )
+    return client.members().delete(groupKey=group_id, memberKey=user_email)
+
+
+def _is_member_exists(exception):
+    return hasattr(exception, "reason") and "Member already exists" in str(
+        exception.reason
+    )
+
+
+def _get_status_code(exception):
+    status = getattr(getattr(exception, "resp", None), "status", None)
+    return int(status) if status is not None else None
+
+
+def _is_transient_error(exception):
+    return _get_status_code(
+        exception
+    ) in constants.TRANSIENT_STATUS_CODES or _is_rate_limit_error(exception)
+
+
+def _is_rate_limit_error(exception):
+    status = _get_status_code(exception)
+    if status == 429:
+        return True
+    return status == 403 and bool(
+        _get_error_reasons(exception) & constants.RATE_LIMIT_ERROR_REASONS
+    )
+
+
+def _get_error_reasons(exception):
+    """Gets the reasons of the errors in a GCP API error response.
+
+    The reasons are read from the response content, since HttpError.error_details
+    prefers the ErrorInfo details over the legacy errors list when both exist.
+    """
+    try:
+        error = json.loads(exception.content)["error"]
+    except Exception:
+        return set()
+    reasons = {
+        item.get("reason")
+        for item in error.get("errors", [])
+        if isinstance(item, dict)
+    }
+    reasons.update(
+        item.get("reason")
+        for item in error.get("details", [])
+        if isinstance(item, dict) and item.get("@type", "").endswith("ErrorInfo")
+    )
+    return reasons
+
+
+def _get_rate_limiter(domain_id):
+    """Gets the token bucket of a GCP domain and its service account.
+
+    The bucket is rebuilt when its rate limit config changes.
+    """
+    config = _get_gcp_config()
+    rate = config.get("rate_limit", constants.DEFAULT_RATE_LIMIT)
+    capacity = config.get("rate_limit_burst", constants.DEFAULT_RATE_LIMIT_BURST)
+    key = (
+        domain_id,
+        get_gcp_domain_details(domain_id).get("service_account_path"),
+    )
+    limiter = _rate_limiters.get(key)
+    if limiter is None or limiter.rate != rate or limiter.capacity != capacity:
+        with _rate_limiters_lock:
+            limiter = _rate_limiters.get(key)
+            if limiter is None or limiter.rate != rate or limiter.capacity != capacity:
+                limiter = _rate_limiters[key] = _TokenBucket(rate, capacity)
+    return limiter
+
+
+def _execute(domain_id, request):
+    """Executes a GCP API request within the rate limit of its domain.
+
+    Requests failing with a rate limit error are retried with exponential
+    backoff and full jitter, up to max_retries times.
+    """
+    config = _get_gcp_config()
+    max_retries = config.get("max_retries", constants.DEFAULT_MAX_RETRIES)
+    base_delay = config.get("retry_base_delay", constants.DEFAULT_RETRY_BASE_DELAY)
+    max_delay = config.get("retry_max_delay", constants.DEFAULT_RETRY_MAX_DELAY)
+    limiter = _get_rate_limiter(domain_id)
+    attempt = 0
+    while True:
+        limiter.acquire()
+        try:
+            return request.execute()
+        except Exception as e:
+            if attempt >= max_retries or not _is_rate_limit_error(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            logger.warning(
+                "GCP request in %s was rate limited, retrying in %.2fs",
+                domain_id, delay
+            )
+            time.sleep(delay)
+            attempt += 1
+
+
+def get_gcp_rate_limiter_stats():
+    """Gets the current fill of the GCP rate limiters.
+
+    Returns:
+        dict: rate, capacity and available tokens of every rate limiter, keyed
+              by (domain ID, service account path).
+    """
+    with _rate_limiters_lock:
+        limiters = dict(_rate_limiters)
+    return {
+        key: {
+            "rate": limiter.rate,
+            "capacity": limiter.capacity,
+            "tokens": limiter.fill(),
+        }
+        for key, limiter in limiters.items()
+    }
+
+
 def get_gcp_groups(domain_id, page_token=None):
     """Gets the list of GCP Groups.
 
@@ -106,10 +669,11 @@ def get_gcp_groups(domain_id, page_token=None):
     """
     client = get_gcp_client(domain_id)
     try:
-        result = (
-            client.groups()
-            .list(domain=domain_id, pageToken=page_token, maxResults=200)
-            .execute()
+        result = _execute(
+            domain_id,
+            client.groups().list(
+                domain=domain_id, pageToken=page_token, maxResults=200
+            ),
         )
 
         return (result.get("groups"), result.get("nextPageToken"))
@@ -120,6 +684,268 @@ def get_gcp_groups(domain_id, page_token=None):
         return None, False
 
 
+def iter_gcp_groups(domain_id, user_email=None):
+    """Yields the groups of a GCP domain, fetching one page at a time.
+
+    Args:
+        domain_id (str): Domain ID of the GCP domain.
+        user_email (str, optional): Only yield the groups this user is a
+            member of. Defaults to None.
+
+    Yields:
+        dict: GCP group.
+    """
+    for groups in _iter_gcp_group_pages(domain_id, user_email):
+        yield from groups
+
+
+def _iter_gcp_group_pages(domain_id, user_email=None):
+    """Yields the pages of groups of a GCP domain."""
+    client = get_gcp_client(domain_id)
+    filters = {"userKey": user_email} if user_email else {}
+    page_token = None
+    while True:
+        result = _execute(
+            domain_id,
+            client.groups().list(
+                domain=domain_id,
+                pageToken=page_token,
+                maxResults=constants.MAX_GROUPS_PAGE_SIZE,
+                **filters,
+            ),
+        )
+        yield result.get("groups", [])
+        page_token = result.get("nextPageToken")
+        if not page_token:
+            return
+
+
+def offboard_gcp_user(user_email):
+    """Make GCP API calls to remove a user from every group in every domain.
+
+    Domains are processed in parallel, and the memberships of each domain
+    are deleted with batch requests.
+
+    Args:
+        user_email (str): Email of the user who is being offboarded.
+
+    Returns:
+        dict: Offboarding report with the overall success and, per domain,
+              the removed groups, the groups that failed with their error and
+              the error raised while listing the user's groups.
+    """
+    domains = get_gcp_domains()
+    report = {"user": user_email, "success": True, "domains": {}}
+    if not domains:
+        return report
+
+    max_workers = min(
+        len(domains),
+        _get_gcp_config().get(
+            "max_parallel_domains", constants.DEFAULT_MAX_PARALLEL_DOMAINS
+        ),
+    )
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        domain_reports = executor.map(
+            lambda domain_id: _offboard_gcp_domain(user_email, domain_id), domains
+        )
+        for domain_id, domain_report in zip(domains, domain_reports):
+            report["domains"][domain_id] = domain_report
+            if domain_report["failed"] or domain_report["error"]:
+                report["success"] = False
+    return report
+
+
+def _offboard_gcp_domain(user_email, domain_id):
+    """Removes a user from every group of a single GCP domain."""
+    domain_report = {"removed": [], "failed": {}, "error": ""}
+    try:
+        groups = [
+            group["email"] for group in iter_gcp_groups(domain_id, user_email)
+        ]
+    except Exception as e:
+        if _get_status_code(e) != 404:
+            logger.error(
+                "Exception while listing GCP groups of %s in %s: %s",
+                user_email, domain_id, str(e)
+            )
+            domain_report["error"] = str(e)
+        return domain_report
+    if not groups:
+        return domain_report
+
+    results = batch_gcp_membership_changes(
+        domain_id,
+        [(constants.DELETE_MEMBER, group_id, user_email) for group_id in groups],
+        skip_precheck=True,
+    )
+    for group_id, (result, exception) in zip(groups, results):
+        if result:
+            domain_report["removed"].append(group_id)
+        else:
+            domain_report["failed"][group_id] = exception
+    return domain_report
+
+
+def iter_gcp_group_members(domain_id, group_id):
+    """Yields the members of a GCP group, fetching one page at a time.
+
+    Args:
+        domain_id (str): Domain ID of the GCP domain.
+        group_id (str): GroupID of the GCP group.
+
+    Yields:
+        dict: GCP group member.
+    """
+    for members in _iter_gcp_member_pages(domain_id, group_id):
+        yield from members
+
+
+def _iter_gcp_member_pages(domain_id, group_id):
+    """Yields the pages of members of a GCP group."""
+    client = get_gcp_client(domain_id)
+    page_token = None
+    while True:
+        result = _execute(
+            domain_id,
+            client.members().list(
+                groupKey=group_id,
+                pageToken=page_token,
+                maxResults=constants.MAX_MEMBERS_PAGE_SIZE,
+            ),
+        )
+        yield result.get("members", [])
+        page_token = result.get("nextPageToken")
+        if not page_token:
+            return
+
+
+def iter_gcp_membership_export(domain_id):
+    """Yields every group of a GCP domain followed by its members.
+
+    Only one page of groups and one page of members are held at a time, and
+    the next page is fetched in the background while the current one is
+    consumed, so large domains are exported with bounded memory. The export
+    always finishes with an end record, or with an error record if a page
+    could not be fetched, so readers can tell a complete export apart from
+    a truncated one.
+
+    Args:
+        domain_id (str): Domain ID of the GCP domain.
+
+    Yields:
+        dict: Export record, either {"type": "group", "domain", "group"} for a
+              group, {"type": "member", "domain", "group", "member"} for a
+              member of the preceding group, {"type": "end", "domain",
+              "groups", "members"} with the exported counts or
+              {"type": "error", "domain", "error"} if the export failed.
+    """
+    group_executor = ThreadPoolExecutor(max_workers=1)
+    member_executor = ThreadPoolExecutor(max_workers=1)
+    group_count = member_count = 0
+    try:
+        group_pages = _iter_gcp_group_pages(domain_id)
+        for groups in _prefetch_pages(group_pages, group_executor):
+            for group in groups:
+                group_count += 1
+                yield {"type": "group", "domain": domain_id, "group": group}
+                member_pages = _iter_gcp_member_pages(domain_id, group["email"])
+                for members in _prefetch_pages(member_pages, member_executor):
+                    for member in members:
+                        member_count += 1
+                        yield {
+                            "type": "member",
+                            "domain": domain_id,
+                            "group": group["email"],
+                            "member": member,
+                        }
+    except Exception as e:
+        logger.exception("Exception while exporting GCP memberships: " + str(e))
+        yield {"type": "error", "domain": domain_id, "error": str(e)}
+        return
+    finally:
+        group_executor.shutdown()
+        member_executor.shutdown()
+    yield {
+        "type": "end",
+        "domain": domain_id,
+        "groups": group_count,
+        "members": member_count,
+    }
+
+
+def _prefetch_pages(pages, executor):
+    """Yields the pages of a page generator while fetching the next page.
+
+    The generator is only ever advanced on the single executor thread, which
+    also keeps the thread local GCP client on that thread.
+    """
+    future = executor.submit(next, pages, None)
+    while True:
+        page = future.result()
+        if page is None:
+            return
+        future = executor.submit(next, pages, None)
+        yield page
+
+
+def search_gcp_groups(domain_id, page_token=None, search=None, match=None):
+    """Gets a page of GCP groups from the in memory group index.
+
+    Args:
+        domain_id (str): Domain ID of the GCP domain.
+        page_token (str, optional): Page Token returned with the previous page.
+        search (str, optional): Case insensitive filter on the group email and name.
+        match (str, optional): "prefix" to match the start of the group email,
+                               otherwise the search matches anywhere in the
+                               group email or name.
+
+    Returns:
+        tuple: List of GCP groups with their email, name and id and the token
+               of the next page, None if there are no more pages. The groups are
+               False if they could not be fetched.
+    """
+    try:
+        entry = _group_index.get(domain_id)
+    except Exception as e:
+        logger.exception(
+            "Something went wrong while fetching the GCP groups: " + str(e)
+        )
+        return False, None
+
+    groups = entry.groups
+    if search:
+        search = search.lower()
+        if match == constants.GROUP_SEARCH_PREFIX:
+            start = bisect.bisect_left(entry.emails, search)
+            end = bisect.bisect_left(entry.emails, search + "\uffff")
+            groups = groups[start:end]
+        else:
+            groups = [
+                group
+                for group, search_key in zip(groups, entry.search_keys)
+                if search in search_key
+            ]
+
+    start = int(page_token) if page_token and page_token.isdigit() else 0
+    end = start + constants.MAX_GROUPS_PAGE_SIZE
+    next_page_token = str(end) if end < len(groups) else None
+    return list(groups[start:end]), next_page_token
+
+
+def prefetch_gcp_group_indexes():
+    """Loads the group index of every GCP domain in the background."""
+    for domain_id in get_gcp_domains():
+        if not _group_index.is_fresh(domain_id):
+            _group_index.refresh_in_background(domain_id)
+
+
+def clear_gcp_group_index():
+    """Drops the in memory GCP group index and group membership cache."""
+    _group_index.clear()
+    _membership_cache.clear()
+
+
 def gcp_group_exists(domain_id, group_id):
     """Checks if the GCP group exists.
 
@@ -132,7 +958,7 @@ def gcp_group_exists(domain_id, group_id):
     """
     client = get_gcp_client(domain_id)
     try:
-        client.groups().get(groupKey=group_id).execute()
+        _execute(domain_id, client.groups().get(groupKey=group_id))
     except Exception as e:
         logger.exception(f"Couldnt find the Group with group_id: {group_id}")
         logger.exception(str(e))
@@ -144,10 +970,6 @@ def get_gcp_domains():
     """Get the list of GCP domains.
 
     Returns:
-        dict: Gets the list of GCP domains.
+        tuple: Gets the list of GCP domains.
     """
-    domains = []
-    for account in ACCESS_MODULES[constants.GCP_ACCESS_TAG]["domains"]:
-        domains.append(account["domain_id"])
-
-    return domains
+    return _get_gcp_domain_index().ids
@@ -1,6 +1,12 @@
+import json
+import os
+import threading
+
 import pytest
 from . import helpers
 from . import access
+from . import constants
+from . import views
 
 
 class MockGoogleClient:
@@ -10,6 +16,24 @@ class MockGoogleClient:
     def members(self):
         return MockMembers()
 
+    def new_batch_http_request(self):
+        return MockBatch()
+
+
+class MockBatch:
+    def __init__(self):
+        self.requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        self.requests.append((request, callback, request_id))
+
+    def execute(self):
+        for request, callback, request_id in self.requests:
+            try:
+                callback(request_id, request.execute(), None)
+            except Exception as e:
+                callback(request_id, None, e)
+
 
 class MockGoogleClientWithException:
     def groups(self):
@@ -152,3 +176,580 @@ def test_GCPAccess(mocker):
 
     result = gcp_access.revoke(userMock, mocker.MagicMock(), label[0], request)
     assert result is True
+
+
+def test_get_gcp_client_cache(mocker, tmp_path):
+    helpers.clear_gcp_client_cache()
+    service_account_path = tmp_path / "gcp.json"
+    service_account_path.write_text(json.dumps({"client_email": "one@example.com"}))
+    mocker.patch(
+        "Access.access_modules.gcp.helpers.get_gcp_domain_details",
+        return_value={
+            "domain_id": "example.com",
+            "admin_id": "admin@example.com",
+            "service_account_path": str(service_account_path),
+        },
+    )
+    from_info = mocker.patch(
+        "Access.access_modules.gcp.helpers.service_account.Credentials."
+        "from_service_account_info",
+        side_effect=lambda *args, **kwargs: mocker.MagicMock(),
+    )
+    build = mocker.patch(
+        "Access.access_modules.gcp.helpers.build",
+        side_effect=lambda *args, **kwargs: mocker.MagicMock(),
+    )
+
+    client = helpers.get_gcp_client("example.com")
+    assert helpers.get_gcp_client("example.com") is client
+
+    thread_clients = []
+    thread = threading.Thread(
+        target=lambda: thread_clients.append(helpers.get_gcp_client("example.com"))
+    )
+    thread.start()
+    thread.join()
+    assert thread_clients[0] is not client
+
+    assert from_info.call_count == 1
+    assert build.call_count == 2
+    assert build.call_args.kwargs["static_discovery"] is True
+
+    service_account_path.write_text(json.dumps({"client_email": "two@example.com"}))
+    os.utime(service_account_path, ns=(0, 0))
+    assert helpers.get_gcp_client("example.com") is not client
+    assert from_info.call_args.args[0] == {"client_email": "two@example.com"}
+
+
+def test_gcp_domain_index(mocker):
+    domains = [
+        {"domain_id": "example.com", "admin_id": "a@example.com", "service_account_path": "a"},
+        {"domain_id": "example.org", "admin_id": "a@example.org", "service_account_path": "b"},
+    ]
+    mocker.patch.dict(
+        "Access.access_modules.gcp.helpers.ACCESS_MODULES",
+        {"gcp_access": {"domains": domains}},
+    )
+    assert helpers.get_gcp_domains() == ("example.com", "example.org")
+    assert helpers.get_gcp_domain_details("example.org") == domains[1]
+    assert helpers.get_gcp_domain_details("example.net") == {}
+
+    mocker.patch.dict(
+        "Access.access_modules.gcp.helpers.ACCESS_MODULES",
+        {"gcp_access": {"domains": domains[:1]}},
+    )
+    assert helpers.get_gcp_domains() == ("example.com",)
+
+
+class MockResponse:
+    def __init__(self, status):
+        self.status = status
+
+
+class MockHttpError(Exception):
+    def __init__(self, status, reason):
+        super().__init__(reason)
+        self.resp = MockResponse(status)
+        self.reason = reason
+
+
+class MockFlakyExecute:
+    def __init__(self, errors):
+        self.errors = errors
+        self.calls = 0
+
+    def execute(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return ""
+
+
+class MockFlakyMembers:
+    def __init__(self, group_errors):
+        self.requests = {
+            group: MockFlakyExecute(list(errors)) for group, errors in group_errors.items()
+        }
+
+    def insert(self, groupKey, body):
+        return self.requests[groupKey]
+
+    def delete(self, groupKey, memberKey):
+        return self.requests[groupKey]
+
+
+class MockFlakyGoogleClient(MockGoogleClient):
+    def __init__(self, group_errors):
+        self.mock_members = MockFlakyMembers(group_errors)
+        self.batches = 0
+
+    def members(self):
+        return self.mock_members
+
+    def new_batch_http_request(self):
+        self.batches += 1
+        return MockBatch()
+
+
+def test_batch_gcp_membership_changes(mocker):
+    mocker.patch("Access.access_modules.gcp.helpers.time.sleep")
+    google_client = MockFlakyGoogleClient({
+        "ok@example.com": [],
+        "exists@example.com": [MockHttpError(409, "Member already exists.")],
+        "flaky@example.com": [MockHttpError(503, "Backend Error")],
+        "missing@example.com": [MockHttpError(404, "Resource Not Found: groupKey")],
+    })
+    mocker.patch(
+        "Access.access_modules.gcp.helpers.get_gcp_client", return_value=google_client
+    )
+    groups = list(google_client.mock_members.requests)
+
+    results = helpers.batch_gcp_membership_changes(
+        "example.com",
+        [(constants.INSERT_MEMBER, group, "test@example.com") for group in groups],
+    )
+    assert [result for result, _ in results] == [True, True, True, False]
+    assert google_client.batches == 2
+    requests = google_client.mock_members.requests.values()
+    assert [request.calls for request in requests] == [1, 1, 2, 1]
+
+
+class MockFailingBatch(MockBatch):
+    def __init__(self, error):
+        super().__init__()
+        self.error = error
+
+    def execute(self):
+        raise self.error
+
+
+def test_batch_gcp_membership_changes_batch_errors(mocker):
+    sleep = mocker.patch("Access.access_modules.gcp.helpers.time.sleep")
+    operations = [(constants.INSERT_MEMBER, "group@example.com", "test@example.com")]
+    for error, expected_batches in (
+        (Exception("invalid_grant: account not found"), 1),
+        (MockHttpError(400, "Bad Request"), 1),
+        (MockHttpError(503, "Backend Error"), constants.BATCH_MAX_RETRIES + 1),
+    ):
+        google_client = MockFlakyGoogleClient({"group@example.com": []})
+        google_client.new_batch_http_request = mocker.MagicMock(
+            side_effect=lambda: MockFailingBatch(error)
+        )
+        mocker.patch(
+            "Access.access_modules.gcp.helpers.get_gcp_client",
+            return_value=google_client,
+        )
+        sleep.reset_mock()
+
+        results = helpers.batch_gcp_membership_changes("example.com", operations)
+        assert results == [(False, str(error))]
+        assert google_client.new_batch_http_request.call_count == expected_batches
+        assert sleep.call_count == expected_batches - 1
+
+
+class MockPagedGroups:
+    def __init__(self, groups, page_size):
+        self.groups = groups
+        self.page_size = page_size
+        self.calls = 0
+
+    def list(self, domain, pageToken=None, maxResults=None, userKey=None):
+        self.calls += 1
+        start = int(pageToken or 0)
+        end = start + self.page_size
+        result = {"groups": self.groups[start:end]}
+        if end < len(self.groups):
+            result["nextPageToken"] = str(end)
+        return MockResult(result)
+
+
+class MockResult:
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self):
+        return self.result
+
+
+class MockPagedGoogleClient(MockGoogleClient):
+    def __init__(self, groups, page_size):
+        self.mock_groups = MockPagedGroups(groups, page_size)
+
+    def groups(self):
+        return self.mock_groups
+
+
+def test_search_gcp_groups(mocker):
+    helpers.clear_gcp_group_index()
+    groups = [
+        {"email": "team-%03d@example.com" % i, "name": "Team %s" % i, "id": str(i)}
+        for i in range(250)
+    ] + [{"email": "admins@example.com", "name": "Administrators", "id": "admins"}]
+    google_client = MockPagedGoogleClient(groups, page_size=100)
+    mocker.patch(
+        "Access.access_modules.gcp.helpers.get_gcp_client", return_value=google_client
+    )
+
+    page, page_token = helpers.search_gcp_groups("example.com")
+    assert page[0]["email"] == "admins@example.com"
+    assert len(page) == constants.MAX_GROUPS_PAGE_SIZE
+    page, page_token = helpers.search_gcp_groups("example.com", page_token=page_token)
+    assert len(page) == 51
+    assert page_token is None
+
+    page, _ = helpers.search_gcp_groups(
+        "example.com", search="TEAM-01", match=constants.GROUP_SEARCH_PREFIX
+    )
+    assert [group["id"] for group in page] == [str(i) for i in range(10, 20)]
+
+    page, _ = helpers.search_gcp_groups("example.com", search="administrators")
+    assert [group["id"] for group in page] == ["admins"]
+    assert google_client.mock_groups.calls == 3
+
+
+class MockMembershipMembers:
+    def __init__(self, members, page_size):
+        self.members = members
+        self.page_size = page_size
+        self.calls = {"list": 0, "get": 0, "insert": 0, "delete": 0}
+
+    def list(self, groupKey, pageToken=None, maxResults=None):
+        self.calls["list"] += 1
+        start = int(pageToken or 0)
+        end = start + self.page_size
+        result = {"members": [{"email": email} for email in self.members[start:end]]}
+        if end < len(self.members):
+            result["nextPageToken"] = str(end)
+        return MockResult(result)
+
+    def get(self, groupKey, memberKey):
+        self.calls["get"] += 1
+        if memberKey.lower() not in self.members:
+            return MockFlakyExecute([MockHttpError(404, "Resource Not Found: memberKey")])
+        return MockResult({"email": memberKey})
+
+    def insert(self, groupKey, body):
+        self.calls["insert"] += 1
+        return MockExecute()
+
+    def delete(self, groupKey, memberKey):
+        self.calls["delete"] += 1
+        return MockExecute()
+
+
+class MockMembershipGoogleClient(MockGoogleClient):
+    def __init__(self, members, page_size):
+        self.mock_members = MockMembershipMembers(members, page_size)
+
+    def members(self):
+        return self.mock_members
+
+
+def test_idempotent_gcp_grants(mocker):
+    helpers.clear_gcp_group_index()
+    mocker.patch.dict(
+        "Access.access_modules.gcp.helpers.ACCESS_MODULES",
+        {"gcp_access": {"domains": [], "idempotent_grants": True}},
+    )
+    members = ["user-%s@example.com" % i for i in range(5)]
+    google_client = MockMembershipGoogleClient(members, page_size=2)
+    mocker.patch(
+        "Access.access_modules.gcp.helpers.get_gcp_client", return_value=google_client
+    )
+    calls = google_client.mock_members.calls
+
+    assert helpers.grant_gcp_access(
+        "group@example.com", "example.com", "User-1@example.com"
+    ) == (True, "")
+    assert calls == {"list": 3, "get": 0, "insert": 0, "delete": 0}
+    assert helpers.grant_gcp_access(
+        "group@example.com", "example.com", "new@example.com"
+    ) == (True, "")
+    assert helpers.grant_gcp_access(
+        "group@example.com", "example.com", "new@example.com"
+    ) == (True, "")
+    assert calls == {"list": 3, "get": 0, "insert": 1, "delete": 0}
+
+    results = helpers.batch_gcp_membership_changes(
+        "example.com",
+        [
+            (constants.INSERT_MEMBER, "group@example.com", "new@example.com"),
+            (constants.DELETE_MEMBER, "group@example.com", "user-2@example.com"),
+            (constants.DELETE_MEMBER, "group@example.com", "other@example.com"),
+        ],
+    )
+    assert results == [(True, ""), (True, ""), (True, "")]
+    assert calls == {"list": 3, "get": 0, "insert": 1, "delete": 1}
+    assert helpers.revoke_gcp_access(
+        "group@example.com", "example.com", "user-2@example.com"
+    ) == (True, "")
+    assert calls["delete"] == 1
+
+    mocker.patch.dict(
+        "Access.access_modules.gcp.helpers.ACCESS_MODULES",
+        {
+            "gcp_access": {
+                "domains": [],
+                "idempotent_grants": True,
+                "verify_membership": True,
+            }
+        },
+    )
+    assert helpers.revoke_gcp_access(
+        "group@example.com", "example.com", "user-3@example.com"
+    ) == (True, "")
+    assert calls == {"list": 3, "get": 0, "insert": 1, "delete": 2}
+    assert helpers.revoke_gcp_access(
+        "group@example.com", "example.com", "ghost@example.com"
+    ) == (True, "")
+    assert calls == {"list": 3, "get": 1, "insert": 1, "delete": 2}
+
+    google_client.mock_members.members.append("late@example.com")
+    assert helpers.revoke_gcp_access(
+        "group@example.com", "example.com", "late@example.com"
+    ) == (True, "")
+    assert calls == {"list": 3, "get": 2, "insert": 1, "delete": 3}
+    helpers.clear_gcp_group_index()
+
+
+class MockFailingGroups:
+    def __init__(self, error):
+        self.error = error
+
+    def list(self, domain, pageToken=None, maxResults=None, userKey=None):
+        return MockFlakyExecute([self.error])
+
+
+class MockOffboardGoogleClient(MockFlakyGoogleClient):
+    def __init__(self, groups, group_errors):
+        super().__init__(group_errors)
+        self.mock_groups = groups
+
+    def groups(self):
+        return self.mock_groups
+
+
+def test_offboard_gcp_user(mocker):
+    mocker.patch("Access.access_modules.gcp.helpers.time.sleep")
+    mocker.patch.dict(
+        "Access.access_modules.gcp.helpers.ACCESS_MODULES",
+        {"gcp_access": {"domains": [], "idempotent_grants": True}},
+    )
+    precheck = mocker.patch(
+        "Access.access_modules.gcp.helpers._is_membership_satisfied"
+    )
+    helpers.clear_gcp_group_index()
+    group_errors = {
+        "ok@example.com": [],
+        "missing@example.com": [MockHttpError(404, "Resource Not Found: groupKey")],
+    }
+    clients = {
+        "example.com": MockOffboardGoogleClient(
+            MockPagedGroups([{"email": group} for group in group_errors], 1),
+            group_errors,
+        ),
+        "unknown.com": MockOffboardGoogleClient(
+            MockFailingGroups(MockHttpError(404, "Resource Not Found: userKey")), {}
+        ),
+        "broken.com": MockOffboardGoogleClient(
+            MockFailingGroups(MockHttpError(403, "Not Authorized")), {}
+        ),
+    }
+    mocker.patch(
+        "Access.access_modules.gcp.helpers.get_gcp_domains",
+        return_value=tuple(clients),
+    )
+    mocker.patch(
+        "Access.access_modules.gcp.helpers.get_gcp_client", side_effect=clients.get
+    )
+
+    report = helpers.offboard_gcp_user("test@example.com")
+    assert report["success"] is False
+    assert report["domains"]["example.com"]["removed"] == ["ok@example.com"]
+    assert list(report["domains"]["example.com"]["failed"]) == ["missing@example.com"]
+    assert report["domains"]["unknown.com"] == {"removed": [], "failed": {}, "error": ""}
+    assert report["domains"]["broken.com"]["error"] == "Not Authorized"
+    assert clients["example.com"].batches == 1
+    assert precheck.call_count == 0
+
+
+class MockExportGoogleClient(MockMembershipGoogleClient):
+    def __init__(self, groups, members, page_size):
+        super().__init__(members, page_size)
+        self.mock_groups = MockPagedGroups(groups, page_size)
+
+    def groups(self):
+        return self.mock_groups
+
+
+def test_export_gcp_memberships(mocker, rf):
+    groups = [{"email": "group-%s@example.com" % i} for i in range(3)]
+    members = ["user-%s@example.com" % i for i in range(3)]
+    google_client = MockExportGoogleClient(groups, members, page_size=2)
+    mocker.patch(
+        "Access.access_modules.gcp.helpers.get_gcp_client", return_value=google_client
+    )
+    mocker.patch(
+        "Access.access_modules.gcp.helpers.get_gcp_domain_details",
+        return_value={"domain_id": "example.com"},
+    )
+
+    request = rf.get("/api/v1/gcp/domain/export", {"gcp_domain": "example.com"})
+    request.user = mocker.MagicMock(is_superuser=False)
+    assert views.export_gcp_memberships(request).status_code == 403
+
+    request.user.is_superuser = True
+    response = views.export_gcp_memberships(request)
+    records = [
+        json.loads(line)
+        for line in b"".join(response.streaming_content).decode().splitlines()
+    ]
+    assert len(records) == len(groups) * (len(members) + 1) + 1
+    assert records[-1] == {
+        "type": "end",
+        "domain": "example.com",
+        "groups": len(groups),
+        "members": len(groups) * len(members),
+    }
+    assert records[0] == {"type": "group", "domain": "example.com", "group": groups[0]}
+    assert records[1] == {
+        "type": "member",
+        "domain": "example.com",
+        "group": "group-0@example.com",
+        "member": {"email": "user-0@example.com"},
+    }
+    assert [record["type"] for record in records[:5]] == [
+        "group", "member", "member", "member", "group"
+    ]
+    assert google_client.mock_groups.calls == 2
+    assert google_client.mock_members.calls["list"] == 6
+
+
+class MockFailingPagedGroups(MockPagedGroups):
+    def list(self, domain, pageToken=None, maxResults=None, userKey=None):
+        if pageToken:
+            return MockFlakyExecute([MockHttpError(503, "Backend Error")])
+        return super().list(domain, pageToken, maxResults, userKey)
+
+
+def test_export_gcp_memberships_errors(mocker, rf):
+    mocker.patch(
+        "Access.access_modules.gcp.helpers.get_gcp_domain_details",
+        return_value={"domain_id": "example.com"},
+    )
+    request = rf.get("/api/v1/gcp/domain/export", {"gcp_domain": "example.com"})
+    request.user = mocker.MagicMock(is_superuser=True)
+
+    google_client = MockOffboardGoogleClient(
+        MockFailingGroups(MockHttpError(403, "Not Authorized")), {}
+    )
+    mocker.patch(
+        "Access.access_modules.gcp.helpers.get_gcp_client", return_value=google_client
+    )
+    assert views.export_gcp_memberships(request).status_code == 500
+
+    groups = [{"email": "group-%s@example.com" % i} for i in range(3)]
+    google_client = MockExportGoogleClient(groups, [], page_size=2)
+    google_client.mock_groups = MockFailingPagedGroups(groups, page_size=2)
+    mocker.patch(
+        "Access.access_modules.gcp.helpers.get_gcp_client", return_value=google_client
+    )
+    response = views.export_gcp_memberships(request)
+    assert response.status_code == 200
+    records = [
+        json.loads(line)
+        for line in b"".join(response.streaming_content).decode().splitlines()
+    ]
+    assert [record["type"] for record in records] == ["group", "group", "error"]
+    assert records[-1]["error"] == "Backend Error"
+
+
+class MockRateLimitError(MockHttpError):
+    def __init__(self, reason, error_info_reason=None):
+        super().__init__(403, reason)
+        error = {"errors": [{"reason": reason}], "code": 403}
+        if error_info_reason:
+            # googleapiclient fills error_details from the details when present
+            error["details"] = [
+                {
+                    "@type": "type.googleapis.com/google.rpc.ErrorInfo",
+                    "reason": error_info_reason,
+                }
+            ]
+            self.error_details = error["details"]
+        self.content = json.dumps({"error": error}).encode()
+
+
+def test_gcp_rate_limiter(mocker):
+    sleep = mocker.patch("Access.access_modules.gcp.helpers.time.sleep")
+    mocker.patch.dict(
+        "Access.access_modules.gcp.helpers.ACCESS_MODULES",
+        {
+            "gcp_access": {
+                "domains": [],
+                "rate_limit": 100,
+                "rate_limit_burst": 10,
+                "max_retries": 2,
+            }
+        },
+    )
+    helpers._rate_limiters.clear()
+
+    request = MockFlakyExecute(
+        [
+            MockRateLimitError("userRateLimitExceeded"),
+            MockRateLimitError("rateLimitExceeded"),
+        ]
+    )
+    assert helpers._execute("example.com", request) == ""
+    assert request.calls == 3
+    assert sleep.call_count >= 2
+
+    request = MockFlakyExecute(
+        [
+            MockRateLimitError("rateLimitExceeded", "QUOTA_EXCEEDED"),
+            MockRateLimitError("forbidden", "RATE_LIMIT_EXCEEDED"),
+        ]
+    )
+    assert helpers._execute("example.com", request) == ""
+    assert request.calls == 3
+
+    request = MockFlakyExecute([MockRateLimitError("forbidden", "ACCESS_DENIED")])
+    with pytest.raises(MockRateLimitError):
+        helpers._execute("example.com", request)
+    assert request.calls == 1
+
+    request = MockFlakyExecute([MockRateLimitError("forbidden")])
+    with pytest.raises(MockRateLimitError):
+        helpers._execute("example.com", request)
+    assert request.calls == 1
+
+    request = MockFlakyExecute([MockRateLimitError("rateLimitExceeded")] * 3)
+    with pytest.raises(MockRateLimitError):
+        helpers._execute("example.com", request)
+    assert request.calls == 3
+
+    stats = helpers.get_gcp_rate_limiter_stats()
+    assert list(stats) == [("example.com", None)]
+    assert stats[("example.com", None)]["capacity"] == 10
+    assert stats[("example.com", None)]["tokens"] <= 10
+    helpers._rate_limiters.clear()
+
+
+def test_gcp_token_bucket(mocker):
+    clock = [0.0]
+    mocker.patch(
+        "Access.access_modules.gcp.helpers.time.monotonic", side_effect=lambda: clock[0]
+    )
+    mocker.patch(
+        "Access.access_modules.gcp.helpers.time.sleep",
+        side_effect=lambda seconds: clock.__setitem__(0, clock[0] + seconds),
+    )
+    bucket = helpers._TokenBucket(rate=4, capacity=4)
+    bucket.acquire(3)
+    assert bucket.fill() == 1
+    bucket.acquire(6)
+    assert clock[0] == 0.75
+    assert bucket.fill() == -2
+    bucket.acquire()
+    assert clock[0] == 1.5
@@ -1,5 +1,12 @@
+import itertools
+import json
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import (
+    HttpResponseForbidden,
+    HttpResponseServerError,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from . import helpers
 
 
@@ -18,7 +25,12 @@ def get_gcp_groups(request):
     page_token = ""
     if data.get("page_token"):
         page_token = data.get("page_token")
-    groups, page_token = helpers.get_gcp_groups(data["gcp_domain"], page_token)
+    groups, page_token = helpers.search_gcp_groups(
+        data["gcp_domain"],
+        page_token=page_token,
+        search=data.get("search"),
+        match=data.get("match"),
+    )
     if groups is False:
         return JsonResponse(
             {"error": "Something went wrong while fetching GCP groups."}
@@ -26,3 +38,41 @@ def get_gcp_groups(request):
     response = {"gcp_groups": groups, "page_token": page_token}
 
     return JsonResponse(response)
+
+
+@login_required
+def export_gcp_memberships(request):
+    """Streams the groups and members of a GCP domain as newline delimited JSON.
+
+    Args:
+        request (HttpRequest): http request with the gcp_domain to export.
+
+    Returns:
+        StreamingHttpResponse: one JSON record per line for every group and member.
+    """
+    if not request.user.is_superuser:
+        return HttpResponseForbidden(
+            json.dumps({"error": "Only admins can export GCP memberships."})
+        )
+    data = request.GET
+    if not data.get("gcp_domain") or not helpers.get_gcp_domain_details(
+        data["gcp_domain"]
+    ):
+        return JsonResponse({"error": "Valid domain is required for GCP Access."})
+    records = helpers.iter_gcp_membership_export(data["gcp_domain"])
+    # the first page is fetched before the response starts, so a domain that
+    # can't be listed gets an error response instead of a failed export file
+    first_record = next(records)
+    if first_record["type"] == "error":
+        return HttpResponseServerError(
+            json.dumps({"error": "Something went wrong while exporting GCP groups."})
+        )
+    records = itertools.chain([first_record], records)
+    response = StreamingHttpResponse(
+        (json.dumps(record) + "\n" for record in records),
+        content_type="application/x-ndjson",
+    )
+    response["Content-Disposition"] = 'attachment; filename="%s.ndjson"' % (
+        data["gcp_domain"]
+    )
+    return response